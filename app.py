@@ -1,24 +1,89 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-import seaborn as sns
+from functools import partial
 
-# Load the CSV file dynamically
-@st.cache_data
-def load_data():
-    return pd.read_csv('https://raw.githubusercontent.com/danielrosehill/GHG-Emissions-Data-Pipeline/refs/heads/main/company_data.csv')
+from charts import MAX_BARS, render_mode
+from dataset import (CARBON_PRICE, DEFAULT_SCOPES, SCOPE_3_UPSTREAM_SHARE, SCOPE_VARIANTS, data_refresher,
+                     load_enriched_data, sector_metrics, select_scopes, use_dataset)
+from leaderboard import LEADERBOARD_GROUPS, LEADERBOARD_METRICS, leaderboard
+from models import MODEL_METHODS, current_sector_models, fit_lines
+from optimizer import (MIN_EBITDA_RATIO, SECTOR_BAND, TURNOVER_AVERSION, covered_holdings, default_max_weight,
+                       optimize_portfolio)
+from peers import current_peer_index
+from portfolio import PORTFOLIO_METRICS, VALUE_METRICS, analyse_holdings
+from reference import REGION_LEVELS, SICS_LEVELS, rollup, sics_code_count
+from prewarm import start_prewarm
+from render_pool import static_charts
+from sensitivity import SENSITIVITY_STEPS, current_sensitivity_table, tornado_rows
+from stats import CONFIDENCE, current_correlation_summary, current_sector_correlations
+from stress import (DISCOUNT_RATES, EMISSION_TRAJECTORIES, END_YEAR, PRICE_PATHS, current_stress_results,
+                    price_path_frame)
+from uploads import load_upload
+from valuation import DEFAULT_FRAMEWORK, VALUATION_FRAMEWORKS, apply_framework, current_framework_values
+from vega_charts import (financial_impact_spec, geographic_spec, scope_breakdown_spec, sector_scatter_spec,
+                         tornado_spec)
 
-# Function to format financial values
-def format_financial(value):
-    return f"${value:.2f}B"
-
-# Function to format emissions values
+# Function to format emissions values ('n/a' where a cohort has no figures)
 def format_emissions(value):
-    return f"{int(value):,}"
+    return 'n/a' if pd.isna(value) else f"{int(value):,}"
+
+# Note how much of the dataset a SICS level covers: the bundled mapping only
+# has the sics_sector codes seen so far, the rest are unclassified
+def sics_coverage_note(data, level):
+    if level in SICS_LEVELS:
+        st.caption(f'The SICS mapping covers {sics_code_count()} sics_sector codes; '
+                   f'{data[level].isna().sum():,} of {len(data):,} companies are unclassified.')
+
+# Function to add companies to the comparison selection (keeps existing picks)
+def add_to_selection(companies):
+    selected = st.session_state.get('selected_companies', [])
+    st.session_state['selected_companies'] = list(dict.fromkeys([*selected, *companies]))
+
+# Function to add companies picked in a leaderboard to the comparison selection
+def add_leaderboard_selection(table, key):
+    add_to_selection(table['company_name'].iloc[st.session_state[key].selection.rows])
+
+# Function to add every company in a sector (or cluster) to the comparison selection
+def add_sector_selection(sector, cohort='sector'):
+    add_to_selection(data.loc[data[cohort] == sector, 'company_name'])
+
+# Warm the shared caches in the background (once per server process)
+warm_up = start_prewarm()
+
+# Missing scope 2/3 values can be filled from sector models instead of
+# dropping those companies from totals, averages and the correlation
+impute = st.sidebar.toggle('Impute missing scopes', help='Fill missing scope 2 and scope 3 emissions from '
+                           'the median ratio to scope 1 (or EBITDA) among peers in the same SICS sector or sector.')
 
-# Load data
-data = load_data()
+# Which scopes are monetized; every variant is precomputed, so switching
+# only changes which columns the views read
+scopes = st.sidebar.selectbox('Scopes monetized', list(SCOPE_VARIANTS),
+                              index=list(SCOPE_VARIANTS).index(DEFAULT_SCOPES), format_func=SCOPE_VARIANTS.get,
+                              help=f'The dataset reports scope 3 as one figure, so the upstream variant assumes '
+                              f'{SCOPE_3_UPSTREAM_SHARE:.0%} of it is upstream (GHG Protocol categories 1-8).')
+
+# Carbon price; other prices rescale the cached monetized columns rather
+# than re-deriving the dataset
+carbon_price = st.sidebar.slider('Carbon price (USD per tonne CO₂e)', 0, 1000, CARBON_PRICE,
+                                 help=f'Defaults to the IFVI rate of ${CARBON_PRICE}.')
+
+# Explore an uploaded CSV instead of the published dataset
+with st.sidebar.expander('Upload Data'):
+    uploaded = st.file_uploader('Emissions CSV', type='csv', help='Same columns as validation/sample-rows.csv. '
+                                'Units and currencies are converted to millions of tonnes CO₂e and billions of USD.')
+    upload = None
+    if uploaded is not None:
+        try:
+            upload, report = load_upload(uploaded.getvalue())
+            st.caption(f"Using {report['accepted']:,} of {report['rows']:,} rows.")
+            for reason, count in report['reasons'].items():
+                st.caption(f'Rejected {count:,}: {reason}')
+        except ValueError as error:
+            st.error(f'Could not use this file: {error}')
+    version = use_dataset(upload)
+
+# Load data (with derived metrics for the whole dataset)
+data = select_scopes(load_enriched_data(carbon_price, impute, version), scopes)
 
 # Title and purpose
 st.title('Monetized GHG Emissions Explorer')
@@ -32,182 +97,396 @@ st.sidebar.markdown(badge_markdown, unsafe_allow_html=True)
 # Add correlation analysis
 st.sidebar.divider()
 with st.sidebar.expander("Dataset Correlation Estimate"):
-    data['total_emissions'] = (data['scope_1_emissions'] + 
-                             data['scope_2_emissions'] + 
-                             data['scope_3_emissions'])
-    
-    data['emissions_per_billion_ebitda'] = data['total_emissions'] / data['ebitda_2022']
-    correlation = -1 * data['emissions_per_billion_ebitda'].corr(data['ebitda_2022'])
-    
+    correlations = current_correlation_summary(impute)
+    pearson_row = correlations.loc['Pearson']
+
     st.metric(
         label="Correlation Coefficient",
-        value=f"{correlation:.3f}",
+        value=f"{pearson_row['estimate']:.3f}",
         help="A positive value suggests companies with better sustainability performance tend to have higher profits."
     )
+    st.caption(f"{CONFIDENCE:.0%} bootstrap interval: {pearson_row['ci_low']:.3f} to {pearson_row['ci_high']:.3f} "
+               f"({correlations.attrs['resamples']:,} resamples); permutation p-value: {pearson_row['p_value']:.4f}")
+    st.dataframe(correlations.round(3), column_config={
+        'estimate': 'Estimate', 'ci_low': 'CI low', 'ci_high': 'CI high', 'p_value': 'p-value'
+    })
+    if st.toggle('Per-sector breakdown'):
+        st.dataframe(current_sector_correlations(impute).round(3), hide_index=True)
 
 # Sector Analysis
 st.sidebar.divider()
 with st.sidebar.expander("Sector Analysis"):
-    sector_metrics = data.groupby('sector').agg({
-        'total_emissions': 'mean',
-        'emissions_per_billion_ebitda': 'mean'
-    }).round(0)
-    
-    selected_sector = st.selectbox('Select Sector', data['sector'].unique())
-    sector_avg_emissions = sector_metrics.loc[selected_sector, 'total_emissions']
-    sector_avg_intensity = sector_metrics.loc[selected_sector, 'emissions_per_billion_ebitda']
+    # Any level of the SICS or region hierarchy, or data-driven clusters (see
+    # clustering.py), can stand in for sectors
+    cohorts = {'sector': 'Sector', **SICS_LEVELS, **REGION_LEVELS, 'cluster': 'Cluster'}
+    cohort = st.selectbox('Cohort', [column for column in cohorts if data[column].notna().any()],
+                          format_func=cohorts.get)
+    sics_coverage_note(data, cohort)
+    sectors = sector_metrics(impute, cohort)
+
+    selected_sector = st.selectbox(f'Select {cohorts[cohort]}', data[cohort].dropna().unique())
+    sector_avg_emissions = sectors.loc[selected_sector, 'total_emissions']
+    sector_avg_intensity = sectors.loc[selected_sector, 'emissions_per_billion_ebitda']
     
-    st.metric("Sector Average Emissions (MT CO₂e)", format_emissions(sector_avg_emissions))
-    st.metric("Sector Average Intensity", format_emissions(sector_avg_intensity))
+    st.metric(f"{cohorts[cohort]} Average Emissions (MT CO₂e)", format_emissions(sector_avg_emissions))
+    st.metric(f"{cohorts[cohort]} Average Intensity", format_emissions(sector_avg_intensity))
+    st.button(f'Compare all companies in {cohorts[cohort].lower()}', on_click=add_sector_selection,
+              args=(selected_sector, cohort))
 
 # Sidebar for selecting companies
 st.sidebar.title('Select Companies')
 selected_companies = st.sidebar.multiselect(
     'Choose companies to compare',
     data['company_name'].unique(),
-    max_selections=5
+    key='selected_companies'
 )
 
-# Filter data for selected companies
-filtered_data = data[data['company_name'].isin(selected_companies)]
+# Interactive charts are drawn by the browser; static ones are rendered on the server
+chart_renderer = st.sidebar.radio('Charts', ['Interactive', 'Static'], horizontal=True,
+                                  help='Interactive charts support tooltips, zoom and legend filtering without reloading.')
 
-if not filtered_data.empty:
-    filtered_data['total_emissions'] = (filtered_data['scope_1_emissions'] + 
-                                      filtered_data['scope_2_emissions'] + 
-                                      filtered_data['scope_3_emissions'])
-    filtered_data['total_emissions_formatted'] = filtered_data['total_emissions'].apply(format_emissions)
-    filtered_data['monetized_all_scope_emissions'] = filtered_data['total_emissions'] * 236_000_000 / 1_000_000_000
-    filtered_data['ebitda_minus_monetized_emissions'] = filtered_data['ebitda_2022'] - filtered_data['monetized_all_scope_emissions']
-
-    # Calculate scope percentages
-    filtered_data['scope1_pct'] = (filtered_data['scope_1_emissions'] / filtered_data['total_emissions']) * 100
-    filtered_data['scope2_pct'] = (filtered_data['scope_2_emissions'] / filtered_data['total_emissions']) * 100
-    filtered_data['scope3_pct'] = (filtered_data['scope_3_emissions'] / filtered_data['total_emissions']) * 100
+# Per-sector regression line overlaid on the sector scatter
+fit_label = st.sidebar.selectbox('Sector fit line', ['None', *MODEL_METHODS.values()])
+fit_method = {label: method for method, label in MODEL_METHODS.items()}.get(fit_label)
+
+# Filter data for selected companies (derived metrics are already computed)
+filtered_data = data[data['company_name'].isin(selected_companies)].copy()
 
 # Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Emissions Analysis", "Financial Impact", "Geographic Analysis", "Sector Comparison"])
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
+    "Emissions Analysis", "Financial Impact", "Geographic Analysis", "Sector Comparison",
+    "Leaderboards", "Peer Finder", "Portfolio", "Stress Test"])
+
+# Column formats for the (virtualized) comparison tables
+emissions_format = st.column_config.NumberColumn(format='localized')
+financial_format = st.column_config.NumberColumn(format='$%.2fB')
+
+# Static charts for every tab are rendered up front, concurrently, with the
+# Financial Impact tab's framework and sensitivity company as its widgets
+# will read them (an unknown company resets to the first)
+rendered_charts = {}
+static_inputs = None
+if chart_renderer == 'Static' and not filtered_data.empty:
+    companies = list(filtered_data['company_name'])
+    static_inputs = (st.session_state.get('framework', DEFAULT_FRAMEWORK),
+                     st.session_state.get('sensitivity_company') if st.session_state.get('sensitivity_company')
+                     in companies else companies[0])
+    rendered_charts = static_charts(selected_companies, carbon_price, fit_method, impute, scopes, *static_inputs)
+
+# Render a chart in the browser (Vega-Lite) or show its server-rendered image
+def show_chart(spec_builder, static_name, chart_data):
+    if chart_renderer == 'Interactive':
+        chart_data, spec = spec_builder(chart_data)
+        st.vega_lite_chart(chart_data, spec)
+    elif rendered_charts.get(static_name) is None:
+        st.info('This chart could not be rendered in time. Try again or switch to interactive charts.')
+    else:
+        st.image(rendered_charts[static_name])
+
+# Note when a large comparison is summarized to stay within the render budget
+def summary_note(n):
+    if render_mode(n) == 'summary':
+        st.caption(f'Comparing {n} companies: showing a summarized view '
+                   f'(at most {MAX_BARS} bars, remaining companies aggregated).')
 
 with tab1:
     if not filtered_data.empty:
         st.subheader('Emissions Breakdown by Scope')
-        
+        summary_note(len(filtered_data))
+
         # Stacked bar chart
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bottom_scope1 = np.zeros(len(filtered_data))
-        bottom_scope2 = filtered_data['scope1_pct']
-        bottom_scope3 = filtered_data['scope1_pct'] + filtered_data['scope2_pct']
-        
-        plt.bar(filtered_data['company_name'], filtered_data['scope1_pct'], label='Scope 1')
-        plt.bar(filtered_data['company_name'], filtered_data['scope2_pct'], bottom=bottom_scope1, label='Scope 2')
-        plt.bar(filtered_data['company_name'], filtered_data['scope3_pct'], bottom=bottom_scope2, label='Scope 3')
-        
-        plt.xlabel('Company')
-        plt.ylabel('Percentage of Total Emissions')
-        plt.title('Emissions Breakdown by Scope (%)')
-        plt.xticks(rotation=45)
-        plt.legend()
-        st.pyplot(fig)
-        
+        show_chart(scope_breakdown_spec, 'scope', filtered_data)
+
         # Emissions table
         st.subheader('Detailed Emissions Data')
-        emissions_table = filtered_data[['company_name', 'scope_1_emissions', 'scope_2_emissions', 
+        emissions_table = filtered_data[['company_name', 'scope_1_emissions', 'scope_2_emissions',
                                        'scope_3_emissions', 'total_emissions']]
         emissions_table = emissions_table.round(0)
         emissions_table.columns = ['Company', 'Scope 1', 'Scope 2', 'Scope 3', 'Total Emissions']
-        st.table(emissions_table.applymap(lambda x: format_emissions(x) if isinstance(x, (int, float)) else x))
+        if impute:
+            # Reported-only totals alongside the imputed ones
+            reported = load_enriched_data(CARBON_PRICE, version=version)
+            emissions_table.insert(4, 'Reported Total', reported.loc[filtered_data.index, 'total_emissions'].round(0))
+            emissions_table['Imputed'] = filtered_data['imputation_note']
+            st.caption(f"{int(filtered_data[['scope_2_imputed', 'scope_3_imputed']].any(axis=1).sum())} of "
+                       f"{len(filtered_data)} selected companies include imputed scopes. Reported-only total: "
+                       f"{format_emissions(emissions_table['Reported Total'].sum())} MT CO₂e; with imputation: "
+                       f"{format_emissions(emissions_table['Total Emissions'].sum())} MT CO₂e.")
+        st.dataframe(emissions_table, hide_index=True, column_config={
+            col: emissions_format for col in ['Scope 1', 'Scope 2', 'Scope 3', 'Reported Total', 'Total Emissions']
+        })
 
 with tab2:
     if not filtered_data.empty:
         st.subheader('EBITDA minus Emissions')
-        
-        fig, ax = plt.subplots(figsize=(12, 6))
-        x = np.arange(len(filtered_data))
-        width = 0.25
-        
-        # Three bars per company
-        bars1 = ax.bar(x - width, filtered_data['ebitda_2022'], width, label='EBITDA', color='blue')
-        bars2 = ax.bar(x, -filtered_data['monetized_all_scope_emissions'], width, label='Monetized Emissions', color='red')
-        bars3 = ax.bar(x + width, filtered_data['ebitda_minus_monetized_emissions'], width, 
-                      label='Net EBITDA', color='green')
-        
-        # Add value labels
-        def add_value_labels(bars):
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width()/2., height,
-                       f'${abs(height):.2f}B',
-                       ha='center', va='bottom')
-        
-        add_value_labels(bars1)
-        add_value_labels(bars2)
-        add_value_labels(bars3)
-        
-        plt.xlabel('Company')
-        plt.ylabel('Billion $')
-        plt.title('EBITDA minus Emissions Analysis')
-        plt.xticks(x, filtered_data['company_name'], rotation=45)
-        plt.legend()
-        
-        st.pyplot(fig)
-        
+        summary_note(len(filtered_data))
+
+        # Every framework is evaluated up front; switching is a column swap
+        framework = st.selectbox('Valuation framework', list(VALUATION_FRAMEWORKS), key='framework', format_func=lambda key: (
+            f'Sidebar carbon price (${carbon_price})' if key == DEFAULT_FRAMEWORK and carbon_price != CARBON_PRICE
+            else VALUATION_FRAMEWORKS[key]['label']))
+        framework_block = current_framework_values(impute)[list(SCOPE_VARIANTS).index(scopes)]
+        rows = data.index.get_indexer(filtered_data.index)
+        financial_data = filtered_data
+        if framework != DEFAULT_FRAMEWORK:
+            monetized = framework_block[list(VALUATION_FRAMEWORKS).index(framework), rows]
+            financial_data = apply_framework(filtered_data, monetized)
+        if scopes != DEFAULT_SCOPES:
+            st.caption(f'Monetizing {SCOPE_VARIANTS[scopes]} emissions.')
+
+        show_chart(financial_impact_spec, 'financial', financial_data)
+
         # Financial metrics table
         st.subheader('Financial Metrics')
-        financial_table = filtered_data[['company_name', 'ebitda_2022', 'monetized_all_scope_emissions', 
-                                       'ebitda_minus_monetized_emissions']]
+        financial_table = financial_data[['company_name', 'ebitda_2022', 'monetized_all_scope_emissions',
+                                        'ebitda_minus_monetized_emissions']]
         financial_table.columns = ['Company', 'EBITDA', 'Monetized Emissions', 'Net EBITDA']
-        
-        # Format financial columns
-        for col in ['EBITDA', 'Monetized Emissions', 'Net EBITDA']:
-            financial_table[col] = financial_table[col].apply(format_financial)
-            
-        st.table(financial_table)
+        st.dataframe(financial_table, hide_index=True, column_config={
+            col: financial_format for col in ['EBITDA', 'Monetized Emissions', 'Net EBITDA']
+        })
+
+        # Monetized emissions under every framework side by side
+        st.subheader('Monetized Emissions by Framework')
+        framework_table = pd.DataFrame(framework_block[:, rows].T, index=filtered_data['company_name'].to_numpy(),
+                                       columns=[framework['label'] for framework in VALUATION_FRAMEWORKS.values()])
+        st.dataframe(framework_table, column_config={column: financial_format for column in framework_table.columns})
+
+        # Which inputs move net EBITDA the most (precomputed for every company)
+        st.subheader('Net EBITDA Sensitivity')
+        sensitivity_company = st.selectbox('Company', filtered_data['company_name'], key='sensitivity_company')
+        tornado = tornado_rows(current_sensitivity_table(carbon_price, impute, scopes, framework),
+                               sensitivity_company)
+        if static_inputs is not None and static_inputs != (framework, sensitivity_company):
+            rendered_charts.update(static_charts(selected_companies, carbon_price, fit_method, impute, scopes,
+                                                 framework, sensitivity_company))
+        show_chart(tornado_spec, 'tornado', tornado)
+        st.caption(f'Each input moved {SENSITIVITY_STEPS[0]:.0%} to {SENSITIVITY_STEPS[-1]:+.0%} on its own, '
+                   f'monetizing {SCOPE_VARIANTS[scopes]} emissions at the selected framework\'s prices; '
+                   'the FX rate only affects EBITDA reported in a currency other than USD.')
+        st.dataframe(tornado[['input', 'low', 'high', 'swing', 'elasticity']].round(3), hide_index=True,
+                     column_config={'input': 'Input', 'low': 'Low', 'high': 'High', 'swing': 'Swing',
+                                    'elasticity': 'Elasticity'})
 
 with tab3:
     if not filtered_data.empty:
         st.subheader('Geographic Distribution')
-        
-        country_emissions = filtered_data.groupby('headquarters_country').agg({
-            'total_emissions': 'sum',
-            'company_name': 'count'
-        }).reset_index()
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        sns.barplot(data=country_emissions, x='headquarters_country', y='total_emissions')
-        plt.xlabel('Country')
-        plt.ylabel('Total Emissions (MT CO₂e)')
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+
+        show_chart(geographic_spec, 'geographic', filtered_data)
 
 with tab4:
     if not filtered_data.empty:
         st.subheader('Sector Comparison')
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        sns.scatterplot(data=filtered_data, x='ebitda_2022', y='emissions_per_billion_ebitda', 
-                       hue='sector', style='sector', s=100)
-        plt.xlabel('EBITDA (Billion $)')
-        plt.ylabel('Emissions Intensity (MT CO₂e/B$)')
-        plt.xticks(rotation=45)
-        st.pyplot(fig)
+
+        if fit_method is None:
+            show_chart(sector_scatter_spec, 'sector', filtered_data)
+        else:
+            coefficients, deviations = current_sector_models(impute)
+            lines = fit_lines(coefficients, filtered_data, 'intensity', fit_method)
+            show_chart(partial(sector_scatter_spec, lines=lines), 'sector', filtered_data)
+
+            # How far each company sits from its sector's line
+            st.subheader('Deviation from Sector Line')
+            prefix = f'intensity_{fit_method}'
+            deviation_table = deviations.loc[filtered_data.index, ['company_name', 'sector', f'{prefix}_fitted',
+                                                                   f'{prefix}_residual', f'{prefix}_deviation']]
+            deviation_table.columns = ['Company', 'Sector', 'Sector Line Intensity', 'Residual', 'Deviation (robust SDs)']
+            st.dataframe(deviation_table.round(2), hide_index=True)
+            st.caption(f'{fit_label} fit of emissions intensity against EBITDA across every company in each sector.')
+
+    # Totals across the whole dataset at any level of the SICS or region hierarchy
+    st.subheader('Roll-up')
+    levels = {**SICS_LEVELS, **REGION_LEVELS}
+    rollup_level = st.selectbox('Level', list(levels), format_func=levels.get)
+    sics_coverage_note(data, rollup_level)
+    totals = rollup(data.assign(companies=1), rollup_level,
+                    ['companies', 'total_emissions', 'ebitda_2022', 'monetized_all_scope_emissions'])
+    st.dataframe(totals.round(2).reset_index().rename(columns={
+        **levels,
+        'companies': 'Companies',
+        'total_emissions': 'Total Emissions',
+        'ebitda_2022': 'EBITDA',
+        'monetized_all_scope_emissions': 'Monetized Emissions',
+    }), hide_index=True, column_config={
+        'Total Emissions': emissions_format,
+        'EBITDA': financial_format,
+        'Monetized Emissions': financial_format,
+    })
+
+with tab5:
+    st.subheader('Leaderboards')
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    board_metric = col1.selectbox('Metric', list(LEADERBOARD_METRICS))
+    board_group = col2.selectbox('Group by', [label for label, column in LEADERBOARD_GROUPS.items()
+                                              if column is None or data[column].notna().any()])
+    board_k = col3.number_input('Top', min_value=1, max_value=100, value=20)
+    board_order = col4.radio('Order', ['Highest', 'Lowest'])
+
+    board = leaderboard(board_metric, LEADERBOARD_GROUPS[board_group], int(board_k),
+                        board_order == 'Highest', carbon_price, impute, scopes)
+    board_display = board.rename(columns={
+        'rank': 'Rank',
+        'company_name': 'Company',
+        **{column: label for label, column in LEADERBOARD_GROUPS.items() if column},
+        LEADERBOARD_METRICS[board_metric]: board_metric,
+    })
+    st.caption('Select rows to add them to the comparison.')
+    st.dataframe(
+        board_display.round(2),
+        hide_index=True,
+        key='leaderboard_rows',
+        on_select=partial(add_leaderboard_selection, board, 'leaderboard_rows'),
+        selection_mode='multi-row'
+    )
+
+with tab6:
+    st.subheader('Peer Finder')
+    st.caption('Nearest companies by scope mix, total emissions, EBITDA and emissions intensity.')
+    peers_index = current_peer_index(impute)
+    col1, col2, col3 = st.columns([3, 1, 1])
+    peer_company = col1.selectbox('Company', peers_index.companies)
+    peer_k = col2.number_input('Peers', min_value=1, max_value=50, value=10)
+    same_sector = col3.checkbox('Same sector')
+
+    if peer_company is not None:
+        peers = peers_index.query(peer_company, int(peer_k), same_sector)
+        peers = peers.join(data.set_index('company_name')[['total_emissions', 'ebitda_2022',
+                                                          'emissions_per_billion_ebitda']], on='company_name')
+        peers.columns = ['Company', 'Sector', 'Distance', 'Total Emissions', 'EBITDA', 'Intensity']
+        st.dataframe(peers.round(2), hide_index=True, column_config={'EBITDA': financial_format})
+        st.button('Add company and peers to comparison', on_click=add_to_selection,
+                  args=([peer_company, *peers['Company']],))
+
+    # Peer sets of every compared company, in one batch query
+    compared = [name for name in filtered_data['company_name'] if name in peers_index]
+    if compared:
+        st.subheader('Peers of the Compared Companies')
+        st.caption(f'The {int(peer_k)} nearest companies to each compared company, from any sector.')
+        peer_names = peers_index.companies[peers_index.query_many(compared, int(peer_k))]
+        st.dataframe(pd.DataFrame({'Company': compared, 'Peers': [list(names) for names in peer_names]}),
+                     hide_index=True, column_config={'Peers': st.column_config.ListColumn('Peers')})
+        st.button('Add their peers to comparison', on_click=add_to_selection, args=(list(peer_names.ravel()),))
+
+with tab7:
+    st.subheader('Portfolio Analysis')
+    st.caption('Upload holdings as CSV with a ticker column, a weight or position_value column and, optionally, '
+               'exchange and portfolio columns (one file can hold many portfolios).')
+    holdings_file = st.file_uploader('Holdings CSV', type='csv')
+
+    if holdings_file is not None:
+        try:
+            portfolios, holdings = analyse_holdings(pd.read_csv(holdings_file), carbon_price, impute, scopes)
+        except ValueError as error:
+            st.error(str(error))
+        else:
+            portfolio_table = portfolios.rename(columns={
+                'holdings': 'Holdings', 'coverage': 'Coverage', **PORTFOLIO_METRICS, **VALUE_METRICS
+            })
+            st.dataframe(portfolio_table.round(2), column_config={
+                'Coverage': st.column_config.NumberColumn(format='percent'),
+                **{label: emissions_format for label in VALUE_METRICS.values()},
+            })
+            st.caption('Metrics are weighted averages of the covered companies\' figures (the portfolio\'s average '
+                       'company), not financed emissions: attributing emissions to a position needs enterprise '
+                       'value or market cap, which the dataset lacks. Coverage is the share of weight that matched '
+                       'a company.')
+            if 'position_value' in portfolios:
+                st.caption('With position values, totals are in the file\'s currency: Value × EBITDA Wiped Out '
+                           'scales each covered position by the share of its company\'s EBITDA that monetized '
+                           'emissions wipe out.')
+
+            unmatched = holdings.loc[holdings['company_name'].isna(), 'ticker'].unique()
+            if len(unmatched):
+                st.warning(f"{len(unmatched)} tickers not in the dataset: {', '.join(map(str, unmatched[:20]))}"
+                           f"{'…' if len(unmatched) > 20 else ''}")
+            st.button('Compare portfolio holdings', on_click=add_to_selection,
+                      args=(holdings['company_name'].dropna().unique(),))
+
+            st.subheader('Low-Carbon Optimizer')
+            st.caption('Reweights the covered holdings to minimize monetized emissions while keeping each sector '
+                       'near its current weight, capping single names and holding EBITDA exposure.')
+            optimize_for = st.selectbox('Portfolio to optimize', portfolios.index)
+            col1, col2 = st.columns(2)
+            # Start from a cap the portfolio's covered names can meet
+            covered = covered_holdings(holdings, data, optimize_for)
+            max_weight = col1.slider('Max single-name weight (%)', 1, 100,
+                                     round(default_max_weight(covered) * 100)) / 100
+            sector_band = col2.slider('Sector band (± % points)', 0, 50, int(SECTOR_BAND * 100)) / 100
+            min_ebitda_ratio = col1.slider('Min EBITDA exposure (% of current)', 0, 150,
+                                           int(MIN_EBITDA_RATIO * 100)) / 100
+            turnover_aversion = col2.select_slider('Turnover aversion', [0.01, 0.1, 1.0, 10.0, 100.0],
+                                                   value=TURNOVER_AVERSION)
+            try:
+                optimized, summary = optimize_portfolio(
+                    holdings, data, optimize_for, max_weight=max_weight, sector_band=sector_band,
+                    min_ebitda_ratio=min_ebitda_ratio, turnover_aversion=turnover_aversion)
+            except ValueError as error:
+                st.error(str(error))
+            else:
+                st.dataframe(summary.round(4))
+                optimized['change'] = optimized['optimized_weight'] - optimized['current_weight']
+                weights = optimized.sort_values('change')[['company_name', 'sector', 'current_weight',
+                                                           'optimized_weight', 'change']]
+                weights.columns = ['Company', 'Sector', 'Current Weight', 'Optimized Weight', 'Change']
+                st.dataframe(weights, hide_index=True, column_config={
+                    column: st.column_config.NumberColumn(format='percent')
+                    for column in ['Current Weight', 'Optimized Weight', 'Change']
+                })
+
+with tab8:
+    if not filtered_data.empty:
+        st.subheader('Carbon Price Stress Test')
+        st.caption(f'Discounted cost of each company\'s {SCOPE_VARIANTS[scopes]} emissions through {END_YEAR} under '
+                   'a carbon price path and an emission trajectory, and that cost as a share of the present value '
+                   'of flat EBITDA. The price paths replace the sidebar carbon price and valuation frameworks.')
+        st.line_chart(price_path_frame(), x_label='Year', y_label='USD per tonne CO₂e')
+
+        col1, col2, col3 = st.columns(3)
+        path = col1.selectbox('Price path', list(PRICE_PATHS))
+        trajectory = col2.selectbox('Emission trajectory', list(EMISSION_TRAJECTORIES))
+        rate = col3.selectbox('Discount rate', DISCOUNT_RATES, index=DISCOUNT_RATES.index(0.02),
+                              format_func='{:.1%}'.format)
+
+        # Slices of the cached companies x paths x trajectories x rates tensor
+        cost, erosion = current_stress_results(impute, scopes)
+        rows = data.index.get_indexer(filtered_data.index)
+        p, j = list(PRICE_PATHS).index(path), list(EMISSION_TRAJECTORIES).index(trajectory)
+        r = DISCOUNT_RATES.index(rate)
+        stress_table = pd.DataFrame({
+            'Company': filtered_data['company_name'].to_numpy(),
+            'NPV Cost': cost[rows, p, j, r],
+            'NPV Erosion (%)': erosion[rows, p, j, r],
+        })
+        st.dataframe(stress_table.round(2), hide_index=True, column_config={'NPV Cost': financial_format})
+
+        st.subheader('Erosion by Discount Rate')
+        by_rate = pd.DataFrame(erosion[rows, p, j, :], index=filtered_data['company_name'].to_numpy(),
+                               columns=[f'{rate:.1%}' for rate in DISCOUNT_RATES])
+        st.dataframe(by_rate.round(2))
 
 # Source data display
 st.subheader('Source Data')
 if not filtered_data.empty:
     source_data = filtered_data[['company_name', 'ebitda_2022', 'monetized_all_scope_emissions', 'total_emissions']]
     source_data.columns = ['Company Name', 'EBITDA', 'Monetized Emissions', 'Total Emissions']
-    
-    # Format financial columns
-    source_data['EBITDA'] = source_data['EBITDA'].apply(format_financial)
-    source_data['Monetized Emissions'] = source_data['Monetized Emissions'].apply(format_financial)
-    source_data['Total Emissions'] = source_data['Total Emissions'].apply(format_emissions)
-    
-    st.dataframe(source_data)
+
+    st.dataframe(source_data, column_config={
+        'EBITDA': financial_format,
+        'Monetized Emissions': financial_format,
+        'Total Emissions': emissions_format,
+    })
 else:
     st.write('Please select companies from the sidebar to view the source data.')
 
 # App information
 with st.sidebar.expander("About This App"):
-    st.write("Emissions are monetized at the rate of $236 per ton of carbon dioxide equivalents as proposed by the International Foundation for Valuing Impacts.")
+    st.write(f"By default, emissions are monetized at the rate of ${CARBON_PRICE} per ton of carbon dioxide equivalents as proposed by the International Foundation for Valuing Impacts. "
+             "Other valuation frameworks can be compared in the Financial Impact tab.")
+    refresher = data_refresher()
+    if refresher.checked:
+        st.caption(f"Dataset {version}, checked for updates at "
+                   f"{pd.Timestamp(refresher.checked, unit='s'):%Y-%m-%d %H:%M} UTC.")
+    if 'timings' in warm_up:
+        st.caption(f"Server caches warmed in {warm_up['timings']['total']:.1f}s.")
 
 # Credits
 with st.sidebar.expander("Credits"):
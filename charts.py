@@ -0,0 +1,170 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+from leaderboard import top_k_indices
+
+# Render budget: beyond these sizes charts switch to summarized views so a
+# comparison of hundreds of companies still renders in bounded time
+MAX_DETAILED_COMPANIES = 15   # grouped bars per company, all values labelled
+MAX_BARS = 40                 # bars per chart before the rest are aggregated
+MAX_VALUE_LABELS = 30         # value labels per chart (largest bars first)
+MAX_TICK_LABELS = 40          # company tick labels per axis
+
+SCOPE_COLUMNS = ['scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions']
+FINANCIAL_COLUMNS = ['ebitda_2022', 'monetized_all_scope_emissions', 'ebitda_minus_monetized_emissions']
+
+# Whether a comparison of n companies is drawn in full or summarized
+def render_mode(n):
+    return 'detailed' if n <= MAX_DETAILED_COMPANIES else 'summary'
+
+# Keep the max_rows - 1 rows with the largest |sort_column| (in that order) and
+# fold the remainder into one "Other" row, summed or averaged
+def downsample_rows(data, sort_column, value_columns, max_rows=MAX_BARS, how='sum'):
+    data = data[['company_name'] + value_columns].reset_index(drop=True)
+    if len(data) <= max_rows:
+        return data.iloc[np.argsort(-data[sort_column].abs().to_numpy(), kind='stable')].reset_index(drop=True)
+
+    keep = top_k_indices(data[sort_column].abs().to_numpy(dtype=float), max_rows - 1)
+    rest = data.drop(index=keep)
+    other = getattr(rest[value_columns], how)()
+    label = f'Other ({len(rest)} companies{", average" if how == "mean" else ""})'
+    other = pd.DataFrame([{'company_name': label, **other.to_dict()}])
+    return pd.concat([data.iloc[keep], other], ignore_index=True)
+
+# Show at most max_labels evenly spaced tick labels
+def cull_tick_labels(ticks, labels, max_labels=MAX_TICK_LABELS):
+    step = max(1, int(np.ceil(len(labels) / max_labels)))
+    return ticks[::step], list(labels)[::step]
+
+# Label only the max_labels bars with the largest magnitude
+def add_value_labels(ax, bars, max_labels=MAX_VALUE_LABELS, horizontal=False):
+    bars = list(bars)
+    sizes = np.array([abs(bar.get_width() if horizontal else bar.get_height()) for bar in bars])
+    for i in top_k_indices(sizes, max_labels):
+        bar = bars[i]
+        if horizontal:
+            width = bar.get_width()
+            ax.text(width, bar.get_y() + bar.get_height() / 2., f'${abs(width):.2f}B',
+                    ha='left' if width >= 0 else 'right', va='center', fontsize=8)
+        else:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width() / 2., height, f'${abs(height):.2f}B',
+                    ha='center', va='bottom')
+
+# Stacked scope shares per company (largest emitters first when summarized)
+def scope_breakdown_figure(data):
+    chart_data = downsample_rows(data, 'total_emissions', SCOPE_COLUMNS + ['total_emissions'])
+    shares = chart_data[SCOPE_COLUMNS].div(chart_data[SCOPE_COLUMNS].sum(axis=1), axis=0) * 100
+    x = np.arange(len(chart_data))
+
+    fig, ax = plt.subplots(figsize=(min(24, max(10, len(x) * 0.35)), 6))
+    bottom = np.zeros(len(x))
+    for column, label in zip(SCOPE_COLUMNS, ['Scope 1', 'Scope 2', 'Scope 3']):
+        values = shares[column].fillna(0).to_numpy()
+        ax.bar(x, values, bottom=bottom, label=label)
+        bottom += values
+
+    ax.set_xlabel('Company')
+    ax.set_ylabel('Percentage of Total Emissions')
+    ax.set_title('Emissions Breakdown by Scope (%)')
+    ticks, labels = cull_tick_labels(x, chart_data['company_name'])
+    ax.set_xticks(ticks, labels, rotation=45, ha='right')
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+# EBITDA, monetized emissions and net EBITDA per company
+def financial_impact_figure(data):
+    if render_mode(len(data)) == 'detailed':
+        fig, ax = plt.subplots(figsize=(12, 6))
+        x = np.arange(len(data))
+        width = 0.25
+
+        # Three bars per company
+        bars1 = ax.bar(x - width, data['ebitda_2022'], width, label='EBITDA', color='blue')
+        bars2 = ax.bar(x, -data['monetized_all_scope_emissions'], width, label='Monetized Emissions', color='red')
+        bars3 = ax.bar(x + width, data['ebitda_minus_monetized_emissions'], width,
+                       label='Net EBITDA', color='green')
+        add_value_labels(ax, [*bars1, *bars2, *bars3])
+
+        ax.set_xlabel('Company')
+        ax.set_ylabel('Billion $')
+        ax.set_title('EBITDA minus Emissions Analysis')
+        ax.set_xticks(x, data['company_name'], rotation=45)
+        ax.legend()
+        return fig
+
+    # Summary: sorted small multiples, one horizontal panel per measure
+    chart_data = downsample_rows(data, 'ebitda_minus_monetized_emissions', FINANCIAL_COLUMNS, how='mean')
+    chart_data = chart_data.sort_values('ebitda_minus_monetized_emissions', ascending=False, kind='stable')
+    y = np.arange(len(chart_data))
+
+    fig, axes = plt.subplots(1, 3, sharey=True, figsize=(15, max(6, len(y) * 0.25)))
+    panels = [
+        ('ebitda_2022', 'EBITDA', 'blue', 1),
+        ('monetized_all_scope_emissions', 'Monetized Emissions', 'red', -1),
+        ('ebitda_minus_monetized_emissions', 'Net EBITDA', 'green', 1),
+    ]
+    for ax, (column, title, color, sign) in zip(axes, panels):
+        bars = ax.barh(y, sign * chart_data[column], color=color)
+        add_value_labels(ax, bars, max_labels=MAX_VALUE_LABELS // 3, horizontal=True)
+        ax.set_title(title)
+        ax.set_xlabel('Billion $')
+        ax.axvline(0, color='grey', linewidth=0.8)
+
+    ticks, labels = cull_tick_labels(y, chart_data['company_name'])
+    axes[0].set_yticks(ticks, labels)
+    axes[0].invert_yaxis()
+    fig.suptitle('EBITDA minus Emissions Analysis (sorted by Net EBITDA)')
+    fig.tight_layout()
+    return fig
+
+# Total emissions by headquarters country
+def geographic_figure(data):
+    country_emissions = data.groupby('headquarters_country').agg({
+        'total_emissions': 'sum',
+        'company_name': 'count'
+    }).reset_index()
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(data=country_emissions, x='headquarters_country', y='total_emissions', ax=ax)
+    ax.set_xlabel('Country')
+    ax.set_ylabel('Total Emissions (MT CO₂e)')
+    ax.tick_params(axis='x', rotation=45)
+    return fig
+
+# Emissions intensity against EBITDA, coloured by sector, optionally with
+# each sector's fitted line (see models.fit_lines)
+def sector_scatter_figure(data, lines=None):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sectors = list(data['sector'].dropna().unique())
+    palette = dict(zip(sectors, sns.color_palette(n_colors=len(sectors))))
+    # Marker styles only distinguish sectors while they stay readable
+    style = 'sector' if len(sectors) <= 10 else None
+    sns.scatterplot(data=data, x='ebitda_2022', y='emissions_per_billion_ebitda', hue='sector',
+                    palette=palette, style=style, s=100 if len(data) <= MAX_BARS else 30, ax=ax)
+    if lines is not None:
+        for line in lines.itertuples():
+            ax.plot([line.x0, line.x1], [line.y0, line.y1], color=palette.get(line.sector, 'grey'),
+                    linestyle='--', linewidth=1.5)
+    ax.set_xlabel('EBITDA (Billion $)')
+    ax.set_ylabel('Emissions Intensity (MT CO₂e/B$)')
+    ax.tick_params(axis='x', rotation=45)
+    return fig
+
+# Tornado of net EBITDA sensitivities for one company (see
+# sensitivity.tornado_rows): one bar per input from its low to its high value
+def tornado_figure(rows):
+    fig, ax = plt.subplots(figsize=(10, max(3, len(rows) * 0.6)))
+    y = np.arange(len(rows))[::-1]
+    base = rows['base'].iloc[0] if len(rows) else 0
+    ax.barh(y, rows['low'] - base, left=base, color='tab:red', label='Lowered')
+    ax.barh(y, rows['high'] - base, left=base, color='tab:green', label='Raised')
+    ax.axvline(base, color='black', linewidth=1)
+    ax.set_yticks(y, rows['input'])
+    ax.set_xlabel('Net EBITDA (Billion $)')
+    ax.legend(title='Input change')
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,111 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from dataset import CLUSTERS_FILE, enrich, load_data
+from entities import deduplicate
+from peers import PEER_FEATURES, profile_features
+
+# Offline clustering of companies by emissions profile (scope mix, size,
+# intensity) with mini-batch k-means. Run `python clustering.py --k 8` to
+# write data/clusters.csv; the app joins those labels on company_id as a
+# 'cluster' facet.
+
+DEFAULT_CLUSTERS = 8
+BATCH_SIZE = 1024
+MAX_ITERATIONS = 200
+N_INIT = 3
+BLOCK_SIZE = 4_000_000  # distance matrix entries per assignment block
+
+# Nearest centre for every row, in blocks; returns labels and squared distances
+def assign(X, centers):
+    labels = np.empty(len(X), dtype=np.intp)
+    distances = np.empty(len(X))
+    center_norms = (centers ** 2).sum(axis=1)
+    step = max(1, BLOCK_SIZE // max(len(centers), 1))
+    for start in range(0, len(X), step):
+        block = X[start:start + step]
+        d = (block ** 2).sum(axis=1)[:, None] + center_norms[None, :] - 2 * block @ centers.T
+        labels[start:start + step] = d.argmin(axis=1)
+        distances[start:start + step] = np.maximum(d[np.arange(len(block)), labels[start:start + step]], 0)
+    return labels, distances
+
+# k-means++ seeding
+def init_centers(X, k, rng):
+    centers = [X[rng.integers(len(X))]]
+    closest = ((X - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        choice = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centers.append(X[choice])
+        closest = np.minimum(closest, ((X - X[choice]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+# Mini-batch k-means: each step assigns a random batch and moves every centre
+# towards the mean of its batch members with a per-centre learning rate
+def minibatch_kmeans(X, k, batch_size=BATCH_SIZE, max_iterations=MAX_ITERATIONS, seed=0):
+    rng = np.random.default_rng(seed)
+    k = min(k, len(X))
+    centers = init_centers(X, k, rng)
+    counts = np.zeros(k)
+    for _ in range(max_iterations):
+        batch = X[rng.integers(len(X), size=min(batch_size, len(X)))]
+        labels, _ = assign(batch, centers)
+        batch_counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, batch)
+        moved = batch_counts > 0
+        counts[moved] += batch_counts[moved]
+        eta = (batch_counts[moved] / counts[moved])[:, None]
+        previous = centers.copy()
+        centers[moved] = (1 - eta) * centers[moved] + eta * sums[moved] / batch_counts[moved, None]
+        if np.abs(centers - previous).max() < 1e-6:
+            break
+    labels, distances = assign(X, centers)
+    return labels, centers, distances.sum()
+
+# Short description of a centre: dominant scope, then size and intensity
+# relative to the dataset average (features are standardized)
+def describe_center(center, mean, scale):
+    raw = dict(zip(PEER_FEATURES, center * scale + mean))
+    dominant = max(['scope1_share', 'scope2_share', 'scope3_share'], key=raw.get)
+    z = dict(zip(PEER_FEATURES, center))
+    size = 'large' if z['log_total_emissions'] > 0 else 'small'
+    intensity = 'high' if z['log_intensity'] > 0 else 'low'
+    return f'Scope {dominant[5]}-heavy, {size} emitters, {intensity} intensity'
+
+# Cluster every company with a complete profile (one row per company_id);
+# returns each company's cluster label
+def cluster_companies(data, k=DEFAULT_CLUSTERS, n_init=N_INIT):
+    features = profile_features(data)
+    complete = features.notna().all(axis=1).to_numpy()
+    values = features.to_numpy(dtype=float)[complete]
+    mean, scale = values.mean(axis=0), values.std(axis=0)
+    scale[scale == 0] = 1
+    X = (values - mean) / scale
+
+    labels, centers, _ = min((minibatch_kmeans(X, k, seed=seed) for seed in range(n_init)),
+                             key=lambda run: run[2])
+
+    # Number clusters from largest to smallest so labels are stable to read
+    order = np.argsort(-np.bincount(labels, minlength=len(centers)), kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    names = [f'{rank[c] + 1}: {describe_center(centers[c], mean, scale)}' for c in range(len(centers))]
+    return pd.DataFrame({
+        'company_id': data['company_id'].to_numpy()[complete],
+        'company_name': data['company_name'].to_numpy()[complete],
+        'cluster': np.array(names, dtype=object)[labels],
+    })
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster companies by emissions profile.')
+    parser.add_argument('--k', type=int, default=DEFAULT_CLUSTERS, help='number of clusters')
+    parser.add_argument('--output', default=CLUSTERS_FILE, help='CSV of company_id, company_name, cluster')
+    args = parser.parse_args()
+
+    clusters = cluster_companies(enrich(deduplicate(load_data())), args.k)
+    clusters.to_csv(args.output, index=False)
+    print(clusters['cluster'].value_counts().sort_index().to_string())
+    print(f'Wrote {len(clusters)} labels to {args.output}')
@@ -0,0 +1,339 @@
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from entities import deduplicate
+from imputation import impute_scopes
+from metrics import MetricGraph, MetricRegistry
+from reference import join_reference
+from refresh import DataRefresher
+from snapshots import read_snapshot
+
+# Source CSV (override with GHG_DATA_URL to point at a local copy or mirror,
+# or at a Parquet file written by ingest.py)
+DATA_URL = os.environ.get(
+    'GHG_DATA_URL',
+    'https://raw.githubusercontent.com/danielrosehill/GHG-Emissions-Data-Pipeline/refs/heads/main/company_data.csv'
+)
+
+# Cluster labels written by clustering.py (company_id, company_name, cluster)
+CLUSTERS_FILE = os.environ.get(
+    'GHG_CLUSTERS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'clusters.csv')
+)
+
+# IFVI rate in USD per tonne of CO₂e
+CARBON_PRICE = 236
+
+# Scope-inclusion variants for monetization: key -> label, with one row of
+# SCOPE_INCLUSION (weights on scope 1, 2, 3) per variant. Scope 3 is reported
+# as a single figure, so the upstream-only variant is an estimate: a fixed
+# share of it (GHG Protocol categories 1-8) until the split is in the
+# dataset. Its label says so wherever it is shown.
+SCOPE_3_UPSTREAM_SHARE = 0.3
+SCOPE_VARIANTS = {
+    'scope_1': 'Scope 1',
+    'scope_12': 'Scope 1 + 2',
+    'all_scope': 'Scope 1 + 2 + 3',
+    'upstream': f'Scope 1 + 2 + 3 (upstream, est. {SCOPE_3_UPSTREAM_SHARE:.0%} of scope 3)',
+}
+SCOPE_INCLUSION = np.array([
+    [1, 0, 0],
+    [1, 1, 0],
+    [1, 1, 1],
+    [1, 1, SCOPE_3_UPSTREAM_SHARE],
+])
+DEFAULT_SCOPES = 'all_scope'
+
+# Monetized value in billions of dollars of emissions in millions of tonnes
+# CO₂e at a price in dollars per tonne
+def monetize(emissions, price):
+    return emissions * price * 1_000_000 / 1_000_000_000
+
+# Source refresher shared by all sessions: serves the last stored snapshot
+# and polls the source for changes in the background (see refresh.py)
+@st.cache_resource(show_spinner=False)
+def data_refresher():
+    refresher = DataRefresher(DATA_URL)
+    refresher.listeners.append(track_source)
+    return refresher.start()
+
+# The source dataset resolved to one row per company, with its derived rows
+# and per-sector and per-country totals (see deltas.py), as of the last
+# version the refresher swapped in
+@st.cache_resource
+def _source_state():
+    return {'version': None, 'data': None, 'delta': None}, threading.Lock()
+
+# Refresher listener: moves the source state to a new version by delta, so
+# only companies added or changed since the previous version are re-derived
+# and the totals are adjusted by their contributions rather than recomputed.
+# Resolving companies and joining the reference tables still cover every row.
+def track_source(version, data):
+    from deltas import DeltaState  # deltas builds on this module
+    resolved = join_reference(deduplicate(data))
+    state, lock = _source_state()
+    with lock:
+        if state['delta'] is None:
+            state['delta'] = DeltaState(resolved)
+        else:
+            state['delta'].update(resolved)
+        state.update(version=version, data=resolved)
+
+# The tracked source data, its enriched rows and its group totals, if the
+# tracker is at that version. Taken under the lock: update replaces the
+# enriched frame and each group's totals rather than modifying them, so
+# these stay as of this version while the refresher moves on.
+def source_state(version):
+    state, lock = _source_state()
+    with lock:
+        if state['version'] != version:
+            return None
+        return state['data'], state['delta'].enriched, dict(state['delta'].totals)
+
+# Uploaded datasets shared by all sessions, by version, least recently used
+# first; evicted past the memory budget (see uploads.py) together with
+# everything cached from them
+UPLOAD_MEMORY_BUDGET = int(os.environ.get('GHG_UPLOAD_BUDGET_MB', 512)) * 1_000_000
+UPLOAD_VERSION_PREFIX = 'upload-'
+
+@st.cache_resource
+def _upload_store():
+    return OrderedDict(), threading.Lock()
+
+def store_upload(version, data, report):
+    store, lock = _upload_store()
+    evicted = []
+    with lock:
+        store[version] = (data, report, data.memory_usage(deep=True).sum())
+        store.move_to_end(version)
+        # The newest upload is kept even if it is over budget on its own
+        while len(store) > 1 and sum(size for _, _, size in store.values()) > UPLOAD_MEMORY_BUDGET:
+            evicted.append(store.popitem(last=False)[0])
+    for old_version in evicted:
+        clear_derived(old_version)
+
+# Calls made to version-keyed caches per upload version (see per_version)
+@st.cache_resource
+def _derived_calls():
+    return {}, threading.Lock()
+
+# Decorator for a cached function whose first argument is a data version.
+# Calls for an upload are recorded as made, so clear_derived can clear
+# exactly their entries when the upload is evicted: derived data (graphs,
+# models, stress tensors...) lives no longer than the upload it came from.
+def per_version(cached):
+    @functools.wraps(cached)
+    def call(version, *args, **kwargs):
+        if version.startswith(UPLOAD_VERSION_PREFIX):
+            calls, lock = _derived_calls()
+            with lock:
+                calls.setdefault(version, set()).add((cached, args, tuple(kwargs.items())))
+        return cached(version, *args, **kwargs)
+    return call
+
+def clear_derived(version):
+    calls, lock = _derived_calls()
+    with lock:
+        evicted = calls.pop(version, ())
+    for cached, args, kwargs in evicted:
+        cached.clear(version, *args, **dict(kwargs))
+
+# An uploaded dataset and its ingestion report, or None if not (or no longer) held
+def find_upload(version):
+    store, lock = _upload_store()
+    with lock:
+        if version not in store:
+            return None
+        store.move_to_end(version)
+        return store[version][:2]
+
+# Dataset pinned by the script run on this thread (see use_dataset)
+_rerun = threading.local()
+
+# Hold an upload for the rest of the script run, so another session's upload
+# evicting it from the store part way through the run doesn't lose it
+def pin_upload(version, upload):
+    _rerun.upload = (version, upload)
+
+# Pin the dataset a script run explores: an upload it picked, or the source
+# dataset as of now. Called once at the top of every run, so every view in
+# the run reads the same version even if the refresher swaps in a new one
+# part way through.
+def use_dataset(version=None):
+    if getattr(_rerun, 'upload', None) is not None and _rerun.upload[0] != version:
+        _rerun.upload = None
+    _rerun.version = version or data_refresher().current[0]
+    return _rerun.version
+
+# Version of the dataset being explored: the content hash of its stored
+# snapshot (or upload), used in cache keys throughout (see snapshots.py).
+# Outside a script run (warm-up, CLIs) it is the source's latest.
+def data_version():
+    if get_script_run_ctx() is not None and getattr(_rerun, 'version', None):
+        return _rerun.version
+    return data_refresher().current[0]
+
+# The current dataset, or another one by version. A copy, so callers may
+# add columns. An upload evicted since the run pinned it is stored again.
+def load_data(version=None):
+    current_version, data = data_refresher().current
+    if version is None or version == current_version:
+        return data.copy()
+    upload = find_upload(version)
+    pinned = getattr(_rerun, 'upload', None)
+    if upload is None and pinned is not None and pinned[0] == version:
+        upload = pinned[1]
+        store_upload(version, *upload)
+    if upload is not None:
+        return upload[0].copy()
+    return read_snapshot(version)
+
+# Derived metrics, each declaring its inputs and parameters (see metrics.py)
+METRICS = MetricRegistry()
+metric = METRICS.metric
+METRIC_DEFAULTS = {'carbon_price': CARBON_PRICE, 'scopes': DEFAULT_SCOPES}
+
+@metric('scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions')
+def total_emissions(scope_1, scope_2, scope_3):
+    return scope_1 + scope_2 + scope_3
+
+@metric('total_emissions', 'ebitda_2022')
+def emissions_per_billion_ebitda(total, ebitda):
+    return total / ebitda
+
+# Emissions counted by every scope variant in one product with the inclusion
+# matrix; a variant is missing only if a scope it includes is
+@metric('scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions')
+def variant_emissions(scope_1, scope_2, scope_3):
+    scopes = np.column_stack([scope_1, scope_2, scope_3]).astype(float)
+    included = SCOPE_INCLUSION.T
+    emissions = np.nan_to_num(scopes) @ included
+    emissions[np.isnan(scopes) @ (included > 0)] = np.nan
+    return pd.DataFrame(emissions, index=scope_1.index, columns=list(SCOPE_VARIANTS))
+
+# Monetized, net EBITDA and share-of-EBITDA columns for every scope variant
+@metric('variant_emissions', 'ebitda_2022', params=('carbon_price',))
+def scope_variants(emissions, ebitda, carbon_price):
+    monetized = monetize(emissions.to_numpy(), carbon_price)
+    ebitda = ebitda.to_numpy(dtype=float)[:, None]
+    variants = {
+        'monetized_emissions': monetized,
+        'ebitda_minus_monetized_emissions': ebitda - monetized,
+        'monetized_share_of_ebitda': monetized / ebitda * 100,
+    }
+    return pd.concat([
+        pd.DataFrame(values, index=emissions.index, columns=[f'{name}_{key}' for key in SCOPE_VARIANTS])
+        for name, values in variants.items()
+    ], axis=1)
+
+# Headline monetized columns for the selected scope variant
+@metric('scope_variants', params=('scopes',))
+def monetized_all_scope_emissions(variants, scopes):
+    return variants[f'monetized_emissions_{scopes}']
+
+@metric('scope_variants', params=('scopes',))
+def ebitda_minus_monetized_emissions(variants, scopes):
+    return variants[f'ebitda_minus_monetized_emissions_{scopes}']
+
+@metric('scope_variants', params=('scopes',))
+def monetized_share_of_ebitda(variants, scopes):
+    return variants[f'monetized_share_of_ebitda_{scopes}']
+
+# Scope percentages
+@metric('scope_1_emissions', 'total_emissions')
+def scope1_pct(scope, total):
+    return scope / total * 100
+
+@metric('scope_2_emissions', 'total_emissions')
+def scope2_pct(scope, total):
+    return scope / total * 100
+
+@metric('scope_3_emissions', 'total_emissions')
+def scope3_pct(scope, total):
+    return scope / total * 100
+
+# Metrics added to the dataset by enrich / load_enriched_data
+ENRICHED_METRICS = ['total_emissions', 'emissions_per_billion_ebitda', 'scope_variants',
+                    'monetized_all_scope_emissions', 'ebitda_minus_monetized_emissions', 'monetized_share_of_ebitda',
+                    'scope1_pct', 'scope2_pct', 'scope3_pct']
+
+# Add the derived columns used throughout the app to the whole dataset
+def enrich(data, carbon_price=CARBON_PRICE):
+    graph = MetricGraph(METRICS, data, METRIC_DEFAULTS)
+    return pd.concat([data, graph.frame(ENRICHED_METRICS, carbon_price=carbon_price)], axis=1)
+
+# Point the headline monetized columns at one scope variant (a column
+# switch: every variant is already computed by enrich)
+def select_scopes(data, scopes=DEFAULT_SCOPES):
+    return data.assign(
+        monetized_all_scope_emissions=data[f'monetized_emissions_{scopes}'],
+        ebitda_minus_monetized_emissions=data[f'ebitda_minus_monetized_emissions_{scopes}'],
+        monetized_share_of_ebitda=data[f'monetized_share_of_ebitda_{scopes}'],
+    )
+
+# Persisted cluster labels (empty if clustering.py hasn't been run)
+@st.cache_data
+def load_clusters():
+    try:
+        return pd.read_csv(CLUSTERS_FILE).drop_duplicates('company_id').set_index('company_id')['cluster']
+    except FileNotFoundError:
+        return pd.Series(dtype=object, name='cluster')
+
+# Metric graph over the dataset (one row per resolved company, with the
+# SICS and region hierarchies joined and imputed scopes if asked), shared by
+# all sessions; its metrics are memoized per carbon price and scope variant.
+# For the tracked source version, the graph starts from the delta state: its
+# derived rows are already up to date at the default price and scopes.
+@per_version
+@st.cache_resource(max_entries=4, show_spinner=False)
+def metric_graph(version, impute=False):
+    tracked = source_state(version)
+    data = join_reference(deduplicate(load_data(version))) if tracked is None else tracked[0].copy()
+    data = impute_scopes(data) if impute else data
+    data['cluster'] = data['company_id'].map(load_clusters())
+    graph = MetricGraph(METRICS, data, METRIC_DEFAULTS)
+    # Imputation borrows from sector peers, so imputed metrics aren't patched
+    if tracked is not None and not impute:
+        enriched = tracked[1].set_axis(data.index)
+        variants = [f'{name}_{key}' for name in ('monetized_emissions', 'ebitda_minus_monetized_emissions',
+                                                  'monetized_share_of_ebitda') for key in SCOPE_VARIANTS]
+        for name in ENRICHED_METRICS:
+            graph.seed(name, enriched[variants if name == 'scope_variants' else name])
+    return graph
+
+def current_metric_graph(impute=False):
+    return metric_graph(data_version(), impute)
+
+# Enriched dataset at any carbon price and imputation setting, for a data
+# version (the pinned one by default). A new price only recomputes the
+# monetized metrics; emissions, intensity and scope shares come from the
+# graph's memo.
+def load_enriched_data(carbon_price=CARBON_PRICE, impute=False, version=None):
+    graph = current_metric_graph(impute) if version is None else metric_graph(version, impute)
+    return pd.concat([graph.data, graph.frame(ENRICHED_METRICS, carbon_price=carbon_price)], axis=1)
+
+# Mean emissions and intensity per sector (or per cluster). Per-sector and
+# per-country means of the tracked source version come from its delta totals.
+@per_version
+@st.cache_data(max_entries=64)
+def _sector_metrics(version, impute=False, group='sector'):
+    tracked = None if impute else source_state(version)
+    if tracked is not None and group in tracked[2]:
+        sums, counts = tracked[2][group]
+        means = sums / counts.where(counts > 0)
+        return means[['total_emissions', 'emissions_per_billion_ebitda']].round(0)
+    metrics = metric_graph(version, impute).frame([group, 'total_emissions', 'emissions_per_billion_ebitda'])
+    return metrics.groupby(group).agg({
+        'total_emissions': 'mean',
+        'emissions_per_billion_ebitda': 'mean'
+    }).round(0)
+
+def sector_metrics(impute=False, group='sector'):
+    return _sector_metrics(data_version(), impute, group)
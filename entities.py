@@ -0,0 +1,141 @@
+import argparse
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from reference import read_dataset_csv
+
+# Entity resolution: the same company contributed under variant names
+# ("Shell", "Shell plc") or with different tickers across exchanges gets one
+# canonical company_id. Candidate pairs come only from small blocks (same
+# ticker, same normalized name, or same HQ country and a shared name
+# trigram), so the cost grows with the block sizes rather than the square of
+# the dataset; each candidate pair is scored by name trigram similarity.
+
+# Tokens dropped from names before comparing (legal forms and filler)
+NAME_STOPWORDS = {
+    'the', 'and', 'plc', 'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited',
+    'llc', 'lp', 'sa', 'ag', 'nv', 'se', 'asa', 'ab', 'oyj', 'spa', 'bv', 'gmbh', 'kgaa', 'holding',
+    'holdings', 'group',
+}
+NAME_THRESHOLD = 0.8        # trigram similarity for a match on the name alone
+TICKER_NAME_THRESHOLD = 0.5  # ... for companies that also share a ticker
+MAX_BLOCK_SIZE = 50         # larger blocks (common trigrams) carry no signal and are skipped
+
+# Lowercase ASCII name without punctuation or legal-form tokens ("S.A." -> "sa" -> dropped)
+def normalize_name(name):
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    tokens = re.sub(r'[^a-z0-9]+', ' ', name.replace('.', '').replace('&', ' and ')).split()
+    kept = [token for token in tokens if token not in NAME_STOPWORDS]
+    return ' '.join(kept or tokens)
+
+# Ticker without exchange prefix or suffix ("LON:SHEL", "SHEL.L" -> "SHEL")
+def normalize_ticker(ticker):
+    if pd.isna(ticker):
+        return None
+    return str(ticker).upper().split(':')[-1].split('.')[0].strip() or None
+
+def trigrams(name):
+    padded = f' {name} '
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+# Rows sharing a block, as (row, key) pairs of the blocking keys
+def blocking_keys(names, tickers, iso_codes, grams):
+    exploded = grams.explode()
+    keys = pd.concat([
+        'ticker:' + tickers.dropna(),
+        'name:' + names,
+        'gram:' + iso_codes.fillna('').loc[exploded.index] + ':' + exploded,
+    ])
+    return keys.rename('key').rename_axis('row').reset_index()
+
+# Candidate pairs (a < b) from every block of 2 to MAX_BLOCK_SIZE rows
+def candidate_pairs(keys):
+    sizes = keys.groupby('key')['row'].transform('size')
+    keys = keys[(sizes > 1) & (sizes <= MAX_BLOCK_SIZE)]
+    pairs = keys.merge(keys, on='key', suffixes=('_a', '_b'))
+    pairs = pairs[pairs['row_a'] < pairs['row_b']]
+    return pairs[['row_a', 'row_b']].drop_duplicates(ignore_index=True)
+
+# Jaccard similarity of the name trigram sets of each pair
+def pair_similarity(pairs, grams):
+    exploded = grams.explode().rename('gram').rename_axis('row').reset_index()
+    shared = (pairs.reset_index(names='pair')
+              .merge(exploded.rename(columns={'row': 'row_a'}), on='row_a')
+              .merge(exploded.rename(columns={'row': 'row_b'}), on=['row_b', 'gram'])
+              .groupby('pair').size()
+              .reindex(pairs.index, fill_value=0)
+              .to_numpy())
+    counts = grams.str.len().to_numpy()
+    return shared / (counts[pairs['row_a']] + counts[pairs['row_b']] - shared)
+
+# Connected components of the matched pairs: the smallest row of each
+# component, found by propagating minimum labels with pointer jumping
+def components(n, a, b):
+    labels = np.arange(n)
+    while True:
+        lowest = np.minimum(labels[a], labels[b])
+        before = labels.copy()
+        np.minimum.at(labels, a, lowest)
+        np.minimum.at(labels, b, lowest)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            return labels
+
+# Canonical company_id for every row, with the candidate and matched pair
+# counts. The id is the normalized name of the group's most complete row,
+# made unique with '-2', '-3'... if unrelated groups share a name.
+def resolve_entities(data):
+    data = data.reset_index(drop=True)
+    names = data['company_name'].map(normalize_name)
+    tickers = data['stock_ticker'].map(normalize_ticker)
+    grams = names.map(trigrams)
+
+    pairs = candidate_pairs(blocking_keys(names, tickers, data['iso_3166_code'], grams))
+    similarity = pair_similarity(pairs, grams)
+    a, b = pairs['row_a'].to_numpy(), pairs['row_b'].to_numpy()
+    same_ticker = (tickers[a].to_numpy() == tickers[b].to_numpy()) & tickers[a].notna().to_numpy()
+    # Numbers in names tell entities apart ("Fund 1", "Fund 2"), so a match on
+    # the name alone needs the same numbers
+    numbers = names.str.findall(r'\d+').str.join(' ').to_numpy()
+    same_numbers = numbers[a] == numbers[b]
+    matched = ((similarity >= NAME_THRESHOLD) & same_numbers) | (same_ticker & (similarity >= TICKER_NAME_THRESHOLD))
+    labels = components(len(data), a[matched], b[matched])
+
+    completeness = data.notna().sum(axis=1)
+    representative = completeness.groupby(labels).idxmax()
+    slugs = names[representative].str.replace(' ', '-').set_axis(representative.index)
+    repeat = slugs.groupby(slugs).cumcount()
+    slugs = slugs.where(repeat == 0, slugs + '-' + (repeat + 1).astype(str))
+    return pd.Series(slugs.loc[labels].to_numpy(), name='company_id'), len(pairs), int(matched.sum())
+
+# One row per company_id, in dataset order: the most complete row, with its
+# missing values filled from the group's other rows
+def deduplicate(data):
+    data = data.reset_index(drop=True)
+    company_id, _, _ = resolve_entities(data)
+    order = data.notna().sum(axis=1).sort_values(ascending=False, kind='stable').index
+    grouped = data.assign(company_id=company_id).loc[order].groupby('company_id', sort=False)
+    representatives = grouped.head(1)
+    merged = grouped.first().loc[representatives['company_id']].reset_index()
+    return merged.set_axis(representatives.index).sort_index()[[*data.columns, 'company_id']].reset_index(drop=True)
+
+# `python entities.py company_data.csv` lists the duplicate groups found
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find duplicate companies and assign canonical ids.')
+    parser.add_argument('source', help='CSV or Parquet dataset')
+    args = parser.parse_args()
+
+    data = pd.read_parquet(args.source) if args.source.endswith('.parquet') else read_dataset_csv(args.source)
+    start = time.perf_counter()
+    company_id, candidates, matches = resolve_entities(data)
+    elapsed = time.perf_counter() - start
+    groups = data.assign(company_id=company_id).groupby('company_id')
+    duplicates = groups.filter(lambda group: len(group) > 1)
+    print(f'{len(data):,} rows, {company_id.nunique():,} companies; {candidates:,} candidate pairs, '
+          f'{matches:,} matches in {elapsed:.2f}s')
+    for key, group in duplicates.groupby('company_id'):
+        print(f"{key}: {', '.join(group['company_name'] + ' (' + group['stock_ticker'].astype(str) + ')')}")
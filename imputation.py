@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+# Fills missing scope 2 and scope 3 values from peer ratios. For each scope,
+# estimates are tried from the most specific peer group to the whole dataset,
+# and at each level a ratio to scope 1 is preferred over a ratio to EBITDA.
+# Every step is a grouped median over the whole frame, with no per-row work.
+
+IMPUTED_SCOPES = ['scope_2_emissions', 'scope_3_emissions']
+IMPUTE_LEVELS = ['sics_sector', 'sector', None]  # None: the whole dataset
+IMPUTE_BASES = ['scope_1_emissions', 'ebitda_2022']
+MIN_REPORTERS = 3
+
+LEVEL_LABELS = {'sics_sector': 'SICS sector', 'sector': 'sector', None: 'dataset'}
+BASIS_LABELS = {'scope_1_emissions': 'scope 1', 'ebitda_2022': 'EBITDA'}
+
+# Median ratio of reported values to basis per group, broadcast back to every
+# row; NaN where the group has fewer than MIN_REPORTERS reporting companies
+def peer_ratio(data, reported, basis, level):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (reported / data[basis]).where(data[basis] > 0)
+    ratio = ratio.replace([np.inf, -np.inf], np.nan)
+    if level is None:
+        median = ratio.median() if ratio.count() >= MIN_REPORTERS else np.nan
+        return pd.Series(median, index=data.index)
+    grouped = ratio.groupby(data[level])
+    return grouped.transform('median').where(grouped.transform('count') >= MIN_REPORTERS)
+
+# Impute missing scopes from reported values only. Adds scope_N_imputed flags
+# and an imputation_note describing the model used for each filled value.
+def impute_scopes(data):
+    data = data.copy()
+    notes = []
+    for scope in IMPUTED_SCOPES:
+        reported = data[scope]
+        filled = reported.copy()
+        note = pd.Series('', index=data.index)
+        scope_label = scope.replace('_emissions', '').replace('_', ' ').capitalize()
+        for level in IMPUTE_LEVELS:
+            for basis in IMPUTE_BASES:
+                estimate = peer_ratio(data, reported, basis, level) * data[basis]
+                fill = filled.isna() & estimate.notna()
+                filled[fill] = estimate[fill]
+                note[fill] = f'{scope_label}: {LEVEL_LABELS[level]} median ratio to {BASIS_LABELS[basis]}'
+        data[scope.replace('_emissions', '_imputed')] = reported.isna() & filled.notna()
+        data[scope] = filled
+        notes.append(note)
+    joined = notes[0]
+    for note in notes[1:]:
+        joined = joined.str.cat(note, sep='; ').str.strip('; ')
+    data['imputation_note'] = joined
+    return data
@@ -0,0 +1,203 @@
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from reference import csv_missing_values
+
+# Streaming ingestion of contributed CSVs (see ref/notes/validation-rows.md).
+# The file is read in chunks; each chunk is validated, normalized to the
+# dataset's units (millions of tonnes CO₂e, billions of USD) and appended to
+# a Parquet file as one row group, so memory is bounded by the chunk size
+# rather than the file size. The output has the source columns only, like
+# company_data.csv, so it can be served as the app's source (GHG_DATA_URL)
+# and derived metrics are computed by the app at whatever price is chosen.
+# Rejected rows go to a CSV with the reason and their line in the source.
+
+CHUNK_SIZE = 100_000    # rows per chunk
+
+# Source columns, as in validation/sample-rows.csv
+TEXT_COLUMNS = ['company_name', 'stock_ticker', 'exchange', 'sector', 'ebitda_currency', 'ebitda_unit',
+                'ebitda_source', 'sustainability_report', 'headquarters_country', 'iso_3166_code',
+                'emissions_reporting_unit', 'notes']
+NUMERIC_COLUMNS = ['sics_sector', 'ebitda_2022', 'scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions']
+SOURCE_COLUMNS = ['company_name', 'stock_ticker', 'exchange', 'sector', 'sics_sector', 'ebitda_2022',
+                  'ebitda_currency', 'ebitda_unit', 'ebitda_source', 'sustainability_report',
+                  'headquarters_country', 'iso_3166_code', 'scope_1_emissions', 'scope_2_emissions',
+                  'scope_3_emissions', 'emissions_reporting_unit', 'notes']
+REQUIRED_COLUMNS = ['company_name', 'sector', 'ebitda_2022', 'scope_1_emissions']
+EMISSIONS_COLUMNS = ['scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions']
+
+# Multipliers to the dataset's units. Emissions units are matched with case,
+# spacing and the CO₂e suffix stripped; a missing unit means the default.
+EMISSIONS_UNITS = {
+    'milliontonnes': 1, 'millionmetrictonnes': 1, 'mt': 1, 'mmt': 1,
+    'thousandtonnes': 1e-3, 'thousandmetrictonnes': 1e-3, 'kt': 1e-3,
+    'tonnes': 1e-6, 'metrictonnes': 1e-6, 't': 1e-6,
+    'kg': 1e-9,
+    'gigatonnes': 1e3, 'gt': 1e3,
+}
+EBITDA_UNITS = {'billion': 1, 'bn': 1, 'b': 1, 'million': 1e-3, 'mn': 1e-3, 'm': 1e-3, 'thousand': 1e-6, 'k': 1e-6}
+# USD per unit of currency, mid-market at the end of 2022 (30 December), as
+# the README's methodology converts the dataset's EBITDA figures
+FX_TO_USD = {
+    'USD': 1.0, 'EUR': 1.0705, 'GBP': 1.2083, 'JPY': 0.00763, 'CHF': 1.081, 'CAD': 0.738, 'AUD': 0.681,
+    'CNY': 0.1449, 'HKD': 0.1282, 'INR': 0.01209, 'KRW': 0.000791, 'SGD': 0.7457, 'SEK': 0.0960,
+    'NOK': 0.1015, 'DKK': 0.1439, 'BRL': 0.1894, 'ZAR': 0.0588, 'MXN': 0.0513,
+}
+DEFAULT_EMISSIONS_UNIT = 'million tonnes CO₂e'
+
+def unit_key(unit):
+    return re.sub(r'co2e?|co₂e?|equivalents?|of|[\s.\-_]', '', str(unit).lower())
+
+# Normalized spelling of a unit or currency column. These columns hold a
+# handful of distinct values, so each is normalized once rather than per row.
+def normalized(values, key, default):
+    values = values.fillna(default)
+    distinct = values.drop_duplicates()
+    return values.map(dict(zip(distinct, distinct.map(key))))
+
+def currency(chunk):
+    return normalized(chunk['ebitda_currency'], lambda code: code.strip().upper(), 'USD')
+
+# Multipliers to the dataset's units per row (NaN where the unit is unknown)
+def currency_scale(chunk):
+    return currency(chunk).map(FX_TO_USD)
+
+def ebitda_scale(chunk):
+    return normalized(chunk['ebitda_unit'], lambda unit: unit.strip().lower(), 'billion').map(EBITDA_UNITS)
+
+def emissions_scale(chunk):
+    return normalized(chunk['emissions_reporting_unit'], unit_key, DEFAULT_EMISSIONS_UNIT).map(EMISSIONS_UNITS)
+
+# Chunks of the source with the expected columns (missing ones empty, extra
+# ones dropped), indexed by line number in the source
+def read_chunks(source, chunk_size=CHUNK_SIZE):
+    reader = pd.read_csv(source, chunksize=chunk_size, dtype={column: str for column in TEXT_COLUMNS},
+                         skipinitialspace=True, **csv_missing_values(SOURCE_COLUMNS))
+    for chunk in reader:
+        chunk.index = chunk.index + 2  # header is line 1
+        yield chunk.reindex(columns=SOURCE_COLUMNS)
+
+# Split a chunk into valid rows and rejected rows (with a reason). Numeric
+# columns are parsed here; values that aren't numbers are rejected rather
+# than read as missing.
+def validate(chunk):
+    source, chunk = chunk, chunk.copy()
+    reasons = pd.Series(pd.NA, index=chunk.index, dtype=object)
+
+    def reject(mask, reason):
+        reasons[mask & reasons.isna()] = reason
+
+    for column in NUMERIC_COLUMNS:
+        parsed = pd.to_numeric(chunk[column], errors='coerce')
+        reject(parsed.isna() & chunk[column].notna(), f'{column} is not a number')
+        chunk[column] = parsed.astype(float)
+    for column in REQUIRED_COLUMNS:
+        reject(chunk[column].isna(), f'{column} is missing')
+    reject((chunk[EMISSIONS_COLUMNS] < 0).any(axis=1), 'negative emissions')
+    reject(currency_scale(chunk).isna(), 'unknown EBITDA currency')
+    reject(ebitda_scale(chunk).isna(), 'unknown EBITDA unit')
+    reject(emissions_scale(chunk).isna(), 'unknown emissions unit')
+
+    rejected = source[reasons.notna()].assign(reason=reasons[reasons.notna()])
+    return chunk[reasons.isna()], rejected
+
+# Convert valid rows to millions of tonnes CO₂e and billions of USD. The
+# reported EBITDA and currency are kept alongside.
+def normalize(chunk):
+    emissions = emissions_scale(chunk)
+    return chunk.assign(
+        reported_ebitda=chunk['ebitda_2022'],
+        reported_currency=currency(chunk),
+        ebitda_2022=chunk['ebitda_2022'] * ebitda_scale(chunk) * currency_scale(chunk),
+        ebitda_currency='USD',
+        ebitda_unit='billion',
+        emissions_reporting_unit=DEFAULT_EMISSIONS_UNIT,
+        **{column: chunk[column] * emissions for column in EMISSIONS_COLUMNS},
+    )
+
+# Normalized valid rows and rejected rows per chunk, with the bytes read so far
+def clean_chunks(source, chunk_size=CHUNK_SIZE):
+    handle = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        for chunk in read_chunks(handle, chunk_size):
+            valid, rejected = validate(chunk)
+            yield normalize(valid), rejected, handle.tell()
+    finally:
+        if handle is not source:
+            handle.close()
+
+# Add a chunk's accepted and rejected rows to a report
+def tally(report, valid, rejected):
+    report['rows'] += len(valid) + len(rejected)
+    report['accepted'] += len(valid)
+    report['rejected'] += len(rejected)
+    for reason, count in rejected['reason'].value_counts().items():
+        report['reasons'][reason] = report['reasons'].get(reason, 0) + count
+
+# Parquet schema for the output, fixed by the first chunk (columns that are
+# empty there are stored as text)
+def output_schema(chunk):
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    return pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+
+# Stream a CSV into a Parquet file of its valid, normalized source columns
+# (written to a temporary file and renamed when complete). Returns rows
+# read, accepted and rejected, rejections per reason, bytes read and seconds
+# taken; progress(report) is called per chunk.
+def ingest(source, output, rejects=None, chunk_size=CHUNK_SIZE, progress=None):
+    start = time.perf_counter()
+    report = {'rows': 0, 'accepted': 0, 'rejected': 0, 'reasons': {}, 'bytes': 0, 'seconds': 0.0}
+    temporary = f'{output}.{os.getpid()}.tmp'
+    writer = None
+    try:
+        for valid, rejected, bytes_read in clean_chunks(source, chunk_size):
+            valid = valid[SOURCE_COLUMNS]
+            if writer is None:
+                schema = output_schema(valid)
+                writer = pq.ParquetWriter(temporary, schema)
+            writer.write_table(pa.Table.from_pandas(valid, schema=schema, preserve_index=False))
+            if rejects is not None and len(rejected):
+                rejected.rename_axis('line').to_csv(rejects, mode='a' if report['rejected'] else 'w',
+                                                    header=not report['rejected'])
+
+            tally(report, valid, rejected)
+            report['bytes'] = bytes_read
+            report['seconds'] = time.perf_counter() - start
+            if progress is not None:
+                progress(report)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(temporary)
+        raise
+    if writer is None:
+        raise ValueError(f'{source} has no rows')
+    writer.close()
+    os.replace(temporary, output)
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+# `python ingest.py rows.csv rows.parquet` streams a contributed CSV into
+# Parquet and prints throughput and rejections; serve the output with
+# GHG_DATA_URL=rows.parquet
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate and normalize a CSV into Parquet, in chunks.')
+    parser.add_argument('source', help='contributed CSV')
+    parser.add_argument('output', help='Parquet file to write')
+    parser.add_argument('--rejects', help='CSV for rejected rows (with reason and source line)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    report = ingest(args.source, args.output, args.rejects, args.chunk_size)
+    seconds = max(report['seconds'], 1e-9)
+    print(f"Read {report['rows']:,} rows ({report['bytes'] / 1e6:,.1f} MB) in {report['seconds']:.2f}s: "
+          f"{report['rows'] / seconds:,.0f} rows/s, {report['bytes'] / 1e6 / seconds:,.1f} MB/s")
+    print(f"Accepted {report['accepted']:,}, rejected {report['rejected']:,}")
+    for reason, count in sorted(report['reasons'].items(), key=lambda item: -item[1]):
+        print(f'  {reason}: {count:,}')
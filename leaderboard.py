@@ -0,0 +1,71 @@
+import numpy as np
+import streamlit as st
+
+from dataset import CARBON_PRICE, DEFAULT_SCOPES, data_version, metric_graph, per_version
+
+# Leaderboard metrics: label -> enriched column
+LEADERBOARD_METRICS = {
+    'EBITDA wiped out by monetized emissions (%)': 'monetized_share_of_ebitda',
+    'Monetized emissions ($B)': 'monetized_all_scope_emissions',
+    'Net EBITDA ($B)': 'ebitda_minus_monetized_emissions',
+    'Total emissions (MT CO₂e)': 'total_emissions',
+    'Emissions intensity (MT CO₂e/B$)': 'emissions_per_billion_ebitda',
+}
+
+# Leaderboard grouping: label -> column (None ranks the whole dataset)
+LEADERBOARD_GROUPS = {
+    'All companies': None,
+    'Sector': 'sector',
+    'SICS sector': 'sics_sector_name',
+    'SICS industry': 'sics_industry',
+    'Region': 'region',
+    'Subregion': 'subregion',
+    'Country': 'headquarters_country',
+    'Cluster': 'cluster',
+}
+
+# Positions of the k largest (or smallest) values in rank order.
+# argpartition selects the top k in linear time; only those k are sorted.
+def top_k_indices(values, k, largest=True):
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if k <= 0 or valid.size == 0:
+        return np.empty(0, dtype=np.intp)
+
+    keys = -values[valid] if largest else values[valid]
+    if k < valid.size:
+        candidates = np.argpartition(keys, k - 1)[:k]
+    else:
+        candidates = np.arange(valid.size)
+    return valid[candidates[np.argsort(keys[candidates], kind='stable')]]
+
+# Top-k companies for a metric, overall or within each group
+@per_version
+@st.cache_data(max_entries=64)
+def _leaderboard(version, metric, group, k, largest, carbon_price, impute, scopes):
+    # Only the ranked metric (and what it depends on) is computed
+    graph = metric_graph(version, impute)
+    column = LEADERBOARD_METRICS[metric]
+    values = graph.get(column, carbon_price=carbon_price, scopes=scopes).to_numpy(dtype=float)
+
+    if group is None:
+        rows = top_k_indices(values, k, largest)
+        ranks = np.arange(1, len(rows) + 1)
+    else:
+        rows, ranks = [], []
+        labels = graph.get(group)
+        for _, positions in sorted(labels.groupby(labels).indices.items()):
+            top = positions[top_k_indices(values[positions], k, largest)]
+            rows.append(top)
+            ranks.append(np.arange(1, len(top) + 1))
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+        ranks = np.concatenate(ranks) if ranks else np.empty(0, dtype=int)
+
+    columns = ['company_name'] + ([group] if group else []) + [column]
+    table = graph.frame(columns, carbon_price=carbon_price, scopes=scopes).iloc[rows].reset_index(drop=True)
+    table.insert(0, 'rank', ranks)
+    return table
+
+def leaderboard(metric, group=None, k=20, largest=True, carbon_price=CARBON_PRICE, impute=False,
+                scopes=DEFAULT_SCOPES):
+    return _leaderboard(data_version(), metric, group, k, largest, carbon_price, impute, scopes)
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Derived metrics as a small dependency graph. Each metric declares the
+# columns or metrics it reads and the parameters it uses; a MetricGraph
+# computes metrics lazily over one dataset and memoizes each one on exactly
+# the parameters it depends on (its own and its inputs'), so changing the
+# carbon price recomputes only the metrics downstream of the price.
+
+MAX_MEMOIZED_BYTES = 128_000_000  # memoized metric values per graph, least recently used evicted
+
+# Bytes held by a memoized Series or DataFrame
+def memory_size(value):
+    usage = value.memory_usage(index=False)
+    return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+
+class MetricRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.dependencies = {}
+
+    # Decorator registering compute(*inputs, **params) under its function
+    # name. Inputs are source columns or metrics registered earlier.
+    def metric(self, *inputs, params=()):
+        def register(compute):
+            found = set(params)
+            for name in inputs:
+                found.update(self.dependencies.get(name, ()))
+            self.metrics[compute.__name__] = (compute, inputs, tuple(params))
+            self.dependencies[compute.__name__] = tuple(sorted(found))
+            return compute
+        return register
+
+class MetricGraph:
+    def __init__(self, registry, data, defaults):
+        self.registry = registry
+        self.data = data
+        self.defaults = defaults
+        self.memo = OrderedDict()
+        self.sizes = {}
+        self.lock = threading.Lock()
+
+    # A metric's value (a Series, or a DataFrame for metrics that produce
+    # several columns) or a source column. Memoized values are shared, so
+    # callers must not modify them in place.
+    def get(self, name, **params):
+        if name not in self.registry.metrics:
+            return self.data[name]
+        compute, inputs, own = self.registry.metrics[name]
+        params = {**self.defaults, **params}
+        key = self._key(name, params)
+        with self.lock:
+            if key in self.memo:
+                self.memo.move_to_end(key)
+                return self.memo[key]
+
+        value = compute(*(self.get(input_name, **params) for input_name in inputs),
+                        **{param: params[param] for param in own})
+        self._memoize(key, value)
+        return value
+
+    # Memoize a value computed elsewhere (e.g. patched by delta from the
+    # previous dataset, see dataset.metric_graph), as get would have
+    def seed(self, name, value, **params):
+        self._memoize(self._key(name, {**self.defaults, **params}), value)
+
+    def _key(self, name, params):
+        return (name, *(params[param] for param in self.registry.dependencies[name]))
+
+    def _memoize(self, key, value):
+        with self.lock:
+            self.memo[key] = value
+            self.memo.move_to_end(key)
+            self.sizes[key] = memory_size(value)
+            # The newest value is kept even if it is over budget on its own
+            while len(self.memo) > 1 and sum(self.sizes.values()) > MAX_MEMOIZED_BYTES:
+                evicted, _ = self.memo.popitem(last=False)
+                del self.sizes[evicted]
+
+    # Several metrics and source columns as one new frame
+    def frame(self, names, **params):
+        columns = [self.get(name, **params) for name in names]
+        return pd.concat([column.rename(name) if isinstance(column, pd.Series) else column
+                          for name, column in zip(names, columns)], axis=1)
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import data_version, load_enriched_data, per_version
+
+# Per-sector regressions of emissions and intensity against EBITDA. Every
+# sector is padded into one row of a (sectors x companies) matrix so all the
+# fits are solved together as stacked 2x2 systems rather than sector by sector.
+
+MODEL_TARGETS = {
+    'emissions': 'total_emissions',
+    'intensity': 'emissions_per_billion_ebitda',
+}
+MODEL_METHODS = {'ols': 'OLS', 'huber': 'Huber', 'theil_sen': 'Theil-Sen'}
+
+MIN_FIT_SIZE = 3
+HUBER_K = 1.345
+HUBER_ITERATIONS = 30
+MAD_SCALE = 1.4826
+BLOCK_SIZE = 4_000_000  # pairwise slopes held in memory per Theil-Sen block
+THEIL_SEN_PAIRS = 1_000_000  # pairs per sector; larger sectors use a random sample of this many
+
+# Pad each group's (x, y) into rows of a (groups x max size) matrix.
+# Returns the matrices, the validity mask and each row's (group, slot).
+def pad_groups(codes, x, y, n_groups):
+    valid = (codes >= 0) & np.isfinite(x) & np.isfinite(y)
+    rows = np.flatnonzero(valid)
+    group = codes[rows]
+    counts = np.bincount(group, minlength=n_groups)
+    order = np.argsort(group, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    slot = np.empty(len(rows), dtype=np.intp)
+    slot[order] = np.arange(len(rows)) - starts[group[order]]
+
+    width = max(int(counts.max()) if n_groups else 0, 1)
+    X = np.zeros((n_groups, width))
+    Y = np.zeros((n_groups, width))
+    mask = np.zeros((n_groups, width), dtype=bool)
+    X[group, slot] = x[rows]
+    Y[group, slot] = y[rows]
+    mask[group, slot] = True
+    return X, Y, mask, rows, group, slot
+
+# Weighted least squares of y = a + b x for every row at once
+def batched_wls(X, Y, W):
+    s0, s1, s2 = W.sum(axis=1), (W * X).sum(axis=1), (W * X * X).sum(axis=1)
+    normal = np.stack([np.stack([s0, s1], axis=-1), np.stack([s1, s2], axis=-1)], axis=-2)
+    rhs = np.stack([(W * Y).sum(axis=1), (W * X * Y).sum(axis=1)], axis=-1)
+    return (np.linalg.pinv(normal) @ rhs[..., None])[..., 0]
+
+# Robust scale (MAD) of each row's residuals
+def masked_mad(R, mask):
+    R = np.where(mask, R, np.nan)
+    with np.errstate(all='ignore'):
+        centre = np.nanmedian(R, axis=1, keepdims=True)
+        return MAD_SCALE * np.nanmedian(np.abs(R - centre), axis=1)
+
+def residuals(X, Y, coef):
+    return Y - (coef[:, :1] + coef[:, 1:] * X)
+
+# Huber M-estimate by iteratively reweighted least squares, all rows together
+def batched_huber(X, Y, mask):
+    W = mask.astype(float)
+    coef = batched_wls(X, Y, W)
+    for _ in range(HUBER_ITERATIONS):
+        R = residuals(X, Y, coef)
+        scale = masked_mad(R, mask)[:, None]
+        with np.errstate(all='ignore'):
+            u = np.abs(R) / (HUBER_K * scale)
+            W = np.where(mask, np.where(u > 1, 1 / u, 1.0), 0.0)
+        W = np.where(np.isfinite(W), W, mask.astype(float))
+        new_coef = batched_wls(X, Y, W)
+        if np.allclose(new_coef, coef, rtol=1e-8, atol=1e-10, equal_nan=True):
+            break
+        coef = new_coef
+    return coef
+
+# Median slope over every pair of each row, in row blocks (the rows' values
+# are padded to X.shape[1] <= sqrt(BLOCK_SIZE))
+def pairwise_median_slopes(X, Y, mask):
+    n_groups, width = X.shape
+    slopes = np.full(n_groups, np.nan)
+    upper = np.triu(np.ones((width, width), dtype=bool), k=1)
+    step = max(1, BLOCK_SIZE // (width * width))
+    for start in range(0, n_groups, step):
+        block = slice(start, start + step)
+        dx = X[block, None, :] - X[block, :, None]
+        dy = Y[block, None, :] - Y[block, :, None]
+        pairs = upper & mask[block, None, :] & mask[block, :, None] & (dx != 0)
+        with np.errstate(all='ignore'):
+            pairwise = np.where(pairs, dy / dx, np.nan).reshape(dx.shape[0], -1)
+            slopes[block] = np.nanmedian(pairwise, axis=1)
+    return slopes
+
+# Median slope over THEIL_SEN_PAIRS random pairs of each row, in row blocks.
+# A row's values fill its first `sizes` slots (see pad_groups).
+def sampled_median_slopes(X, Y, sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    slopes = np.full(len(X), np.nan)
+    step = max(1, BLOCK_SIZE // THEIL_SEN_PAIRS)
+    for start in range(0, len(X), step):
+        block = np.arange(start, min(start + step, len(X)))
+        i = (rng.random((len(block), THEIL_SEN_PAIRS)) * sizes[block, None]).astype(np.intp)
+        j = (rng.random((len(block), THEIL_SEN_PAIRS)) * sizes[block, None]).astype(np.intp)
+        rows = block[:, None]
+        dx = X[rows, j] - X[rows, i]
+        with np.errstate(all='ignore'):
+            pairwise = np.where(dx != 0, (Y[rows, j] - Y[rows, i]) / dx, np.nan)
+            slopes[block] = np.nanmedian(pairwise, axis=1)
+    return slopes
+
+# Theil-Sen: median of pairwise slopes, then median intercept. Sectors with
+# up to THEIL_SEN_PAIRS pairs use every pair; larger ones a random sample of
+# pairs, so memory stays within BLOCK_SIZE whatever the sector size.
+def batched_theil_sen(X, Y, mask):
+    sizes = mask.sum(axis=1)
+    slopes = np.full(len(X), np.nan)
+    exact = sizes * sizes <= THEIL_SEN_PAIRS
+    if exact.any():
+        width = max(int(sizes[exact].max()), 1)
+        slopes[exact] = pairwise_median_slopes(X[exact, :width], Y[exact, :width], mask[exact, :width])
+    if not exact.all():
+        slopes[~exact] = sampled_median_slopes(X[~exact], Y[~exact], sizes[~exact])
+    with np.errstate(all='ignore'):
+        intercepts = np.nanmedian(np.where(mask, Y - slopes[:, None] * X, np.nan), axis=1)
+    return np.stack([intercepts, slopes], axis=1)
+
+FITTERS = {
+    'ols': lambda X, Y, mask: batched_wls(X, Y, mask.astype(float)),
+    'huber': batched_huber,
+    'theil_sen': batched_theil_sen,
+}
+
+# Fit every target x method for every sector. Returns the coefficient table
+# and, per company, the fitted value, residual and deviation (residual in
+# units of the sector's robust residual scale) for each target and method.
+def fit_sector_models(data, group='sector'):
+    codes, sectors = pd.factorize(data[group])
+    x = data['ebitda_2022'].to_numpy(dtype=float)
+    coefficients = []
+    deviations = pd.DataFrame(index=data.index)
+    deviations['company_name'] = data['company_name']
+    deviations[group] = data[group]
+
+    for target, column in MODEL_TARGETS.items():
+        X, Y, mask, rows, row_group, slot = pad_groups(codes, x, data[column].to_numpy(dtype=float), len(sectors))
+        sizes = mask.sum(axis=1)
+        for method, fitter in FITTERS.items():
+            coef = fitter(X, Y, mask)
+            coef[sizes < MIN_FIT_SIZE] = np.nan
+            R = residuals(X, Y, coef)
+            scale = masked_mad(R, mask)
+
+            coefficients.append(pd.DataFrame({
+                group: sectors, 'target': target, 'method': method, 'companies': sizes,
+                'intercept': coef[:, 0], 'slope': coef[:, 1], 'residual_scale': scale,
+            }))
+            with np.errstate(all='ignore'):
+                D = R / scale[:, None]
+            for name, values in [('fitted', Y - R), ('residual', R), ('deviation', D)]:
+                column_values = np.full(len(data), np.nan)
+                column_values[rows] = values[row_group, slot]
+                deviations[f'{target}_{method}_{name}'] = column_values
+
+    return pd.concat(coefficients, ignore_index=True), deviations
+
+# Sector models for the whole dataset, cached per data version
+@per_version
+@st.cache_data(max_entries=8, show_spinner=False)
+def sector_models(version, impute=False):
+    return fit_sector_models(load_enriched_data(impute=impute, version=version))
+
+def current_sector_models(impute=False):
+    return sector_models(data_version(), impute)
+
+# Line segments for one target/method over each sector's EBITDA range in data
+def fit_lines(coefficients, data, target='intensity', method='ols'):
+    ranges = data.groupby('sector')['ebitda_2022'].agg(['min', 'max'])
+    fits = coefficients[(coefficients['target'] == target) & (coefficients['method'] == method)]
+    lines = fits.set_index('sector').join(ranges, how='inner').dropna(subset=['slope', 'min', 'max'])
+    return pd.DataFrame({
+        'sector': lines.index,
+        'x0': lines['min'], 'x1': lines['max'],
+        'y0': lines['intercept'] + lines['slope'] * lines['min'],
+        'y1': lines['intercept'] + lines['slope'] * lines['max'],
+    }).reset_index(drop=True)
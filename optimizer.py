@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# Low-carbon reweighting of one portfolio:
+#   minimize   monetized emissions of the portfolio (+ a small pull towards
+#              the current weights, which makes the solution unique)
+#   subject to weights sum to 1, 0 <= w <= max_weight,
+#              each sector within +/- sector_band of its current weight,
+#              weighted EBITDA >= min_ebitda_ratio x current weighted EBITDA.
+# For a fixed EBITDA multiplier the problem is a Euclidean projection onto the
+# box/sector/budget polytope, solved exactly by bisection on its dual
+# variables; the EBITDA multiplier is then found by an outer bisection.
+# Every step is a vector operation over all names.
+
+MAX_WEIGHT = 0.05
+SECTOR_BAND = 0.05
+MIN_EBITDA_RATIO = 1.0
+TURNOVER_AVERSION = 1.0
+ITERATIONS = 60
+
+# Projection of v onto {0 <= w <= cap, lower_s <= sum_s(w) <= upper_s, sum(w) = 1}.
+# KKT: w = clip(v - nu - eta[sector], 0, cap); sector totals are the
+# unconstrained totals clipped into their bands, and nu makes them sum to 1.
+def project(v, sector, lower, upper, cap, iterations=ITERATIONS):
+    n_sectors = len(lower)
+
+    def sector_sums(shift):
+        return np.bincount(sector, weights=np.clip(v - shift, 0, cap), minlength=n_sectors)
+
+    lo, hi = v.min() - cap, v.max()
+    for _ in range(iterations):
+        nu = (lo + hi) / 2
+        if np.clip(sector_sums(nu), lower, upper).sum() > 1:
+            lo = nu
+        else:
+            hi = nu
+    nu = (lo + hi) / 2
+    target = np.clip(sector_sums(nu), lower, upper)
+
+    # Per-sector shift so each sector hits its target, all sectors at once
+    lo = np.full(n_sectors, v.min() - nu - cap)
+    hi = np.full(n_sectors, v.max() - nu)
+    for _ in range(iterations):
+        eta = (lo + hi) / 2
+        above = sector_sums(nu + eta[sector]) > target
+        lo = np.where(above, eta, lo)
+        hi = np.where(above, hi, eta)
+    return np.clip(v - nu - ((lo + hi) / 2)[sector], 0, cap)
+
+# Optimize one portfolio. current: weights (any scale), cost: monetized
+# emissions, ebitda: EBITDA, sectors: sector labels, all per holding.
+def optimize_weights(current, cost, ebitda, sectors, max_weight=MAX_WEIGHT, sector_band=SECTOR_BAND,
+                     min_ebitda_ratio=MIN_EBITDA_RATIO, turnover_aversion=TURNOVER_AVERSION):
+    current = np.asarray(current, dtype=float)
+    current = current / current.sum()
+    cost = np.asarray(cost, dtype=float)
+    ebitda = np.asarray(ebitda, dtype=float)
+    sector, sector_names = pd.factorize(pd.Series(sectors).fillna('Unknown'))
+
+    if max_weight * len(current) < 1:
+        raise ValueError(f'A {max_weight:.1%} cap cannot be met with {len(current)} holdings.')
+    benchmark = np.bincount(sector, weights=current, minlength=len(sector_names))
+    capacity = np.bincount(sector, minlength=len(sector_names)) * max_weight
+    lower = np.maximum(benchmark - sector_band, 0)
+    upper = np.minimum(benchmark + sector_band, capacity)
+    if (lower > capacity).any() or upper.sum() < 1:
+        raise ValueError('The sector bands cannot be met under the single-name cap.')
+
+    # Unit-free costs so turnover aversion means the same at any carbon price
+    cost_scale = np.abs(cost).mean() or 1
+    ebitda_scale = np.abs(ebitda).mean() or 1
+    required = min_ebitda_ratio * current @ ebitda
+
+    def solve(mu):
+        gradient = (cost / cost_scale - mu * ebitda / ebitda_scale) / turnover_aversion
+        return project(current - gradient, sector, lower, upper, max_weight)
+
+    weights = solve(0)
+    if weights @ ebitda < required:
+        lo, hi = 0.0, 1.0
+        while solve(hi) @ ebitda < required:
+            hi *= 2
+            if hi > 1e9:
+                raise ValueError('The EBITDA exposure target cannot be met under these constraints.')
+        for _ in range(ITERATIONS):
+            mid = (lo + hi) / 2
+            if solve(mid) @ ebitda < required:
+                lo = mid
+            else:
+                hi = mid
+        weights = solve(hi)
+    return weights
+
+# A portfolio's holdings with emissions and EBITDA data, one row per company
+def covered_holdings(holdings, data, portfolio):
+    held = holdings[(holdings['portfolio'] == portfolio) & holdings['company_name'].notna()]
+    held = held.groupby('company_name', as_index=False)['amount'].sum()
+    held = held.merge(data[['company_name', 'sector', 'monetized_all_scope_emissions', 'ebitda_2022',
+                            'total_emissions']].drop_duplicates('company_name'), on='company_name')
+    return held.dropna(subset=['monetized_all_scope_emissions', 'ebitda_2022']).reset_index(drop=True)
+
+# Default single-name cap for covered holdings: MAX_WEIGHT, raised to the
+# smallest whole percentage they can meet. n names need a cap of at least
+# 1/n, and each sector's names must reach the bottom of its band.
+def default_max_weight(held, sector_band=SECTOR_BAND):
+    if held.empty:
+        return MAX_WEIGHT
+    sectors = (held['amount'] / held['amount'].sum()).groupby(held['sector'])
+    needed = max(1 / len(held), ((sectors.sum() - sector_band) / sectors.size()).max())
+    return max(MAX_WEIGHT, np.ceil(round(needed * 100, 6)) / 100)
+
+# Optimize a portfolio from portfolio.analyse_holdings output: returns the
+# holdings with current and optimized weights, and a before/after summary
+def optimize_portfolio(holdings, data, portfolio, **constraints):
+    held = covered_holdings(holdings, data, portfolio)
+    if held.empty:
+        raise ValueError('None of the holdings have emissions and EBITDA data.')
+
+    held['current_weight'] = held['amount'] / held['amount'].sum()
+    held['optimized_weight'] = optimize_weights(held['current_weight'], held['monetized_all_scope_emissions'],
+                                                held['ebitda_2022'], held['sector'], **constraints)
+    summary = pd.DataFrame({
+        weight: {
+            'Weighted Avg. Monetized Emissions ($B)': held[weight] @ held['monetized_all_scope_emissions'],
+            'Weighted Avg. Emissions (MT CO₂e)': held[weight] @ held['total_emissions'].fillna(0),
+            'Weighted Avg. EBITDA ($B)': held[weight] @ held['ebitda_2022'],
+            'Largest Weight': held[weight].max(),
+        } for weight in ['current_weight', 'optimized_weight']
+    }).rename(columns={'current_weight': 'Current', 'optimized_weight': 'Optimized'})
+    return held, summary
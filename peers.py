@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import data_version, load_enriched_data, per_version
+from leaderboard import top_k_indices
+
+# Nearest-neighbour peers over standardized emission and financial profiles.
+# The feature matrix is built once per data version and shared by all
+# sessions; a query is one pass of squared distances plus a partial selection.
+
+PEER_FEATURES = ['scope1_share', 'scope2_share', 'scope3_share',
+                 'log_total_emissions', 'log_ebitda', 'log_intensity']
+BLOCK_SIZE = 4_000_000  # distance matrix entries per block for batch queries
+
+# Raw (unscaled) profile features; rows that can't be profiled are NaN
+def profile_features(data):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features = pd.DataFrame({
+            'scope1_share': data['scope1_pct'] / 100,
+            'scope2_share': data['scope2_pct'] / 100,
+            'scope3_share': data['scope3_pct'] / 100,
+            'log_total_emissions': np.log10(data['total_emissions'].where(data['total_emissions'] > 0)),
+            'log_ebitda': np.log10(data['ebitda_2022'].where(data['ebitda_2022'] > 0)),
+            'log_intensity': np.log10(data['emissions_per_billion_ebitda'].where(
+                data['emissions_per_billion_ebitda'] > 0)),
+        }, index=data.index)
+    return features.replace([np.inf, -np.inf], np.nan)
+
+class PeerIndex:
+    def __init__(self, data):
+        features = profile_features(data)
+        complete = features.notna().all(axis=1).to_numpy()
+        values = features.to_numpy(dtype=float)[complete]
+        self.mean = values.mean(axis=0)
+        self.scale = values.std(axis=0)
+        self.scale[self.scale == 0] = 1
+        self.vectors = ((values - self.mean) / self.scale).astype(np.float32)
+        self.norms = (self.vectors ** 2).sum(axis=1)
+        self.companies = data['company_name'].to_numpy()[complete]
+        self.sectors = data['sector'].to_numpy()[complete]
+        self.positions = {name: i for i, name in enumerate(self.companies)}
+
+    def __contains__(self, company):
+        return company in self.positions
+
+    # The k most similar companies to one company (itself excluded)
+    def query(self, company, k=10, same_sector=False):
+        i = self.positions[company]
+        distances = ((self.vectors - self.vectors[i]) ** 2).sum(axis=1)
+        distances[i] = np.nan
+        if same_sector:
+            distances[self.sectors != self.sectors[i]] = np.nan
+        nearest = top_k_indices(distances, k, largest=False)
+        return pd.DataFrame({
+            'company_name': self.companies[nearest],
+            'sector': self.sectors[nearest],
+            'distance': np.sqrt(distances[nearest]),
+        })
+
+    # k nearest peers for many companies at once: blocked brute force using
+    # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b; returns (queries x k) positions
+    def query_many(self, companies, k=10):
+        queries = np.array([self.positions[name] for name in companies], dtype=np.intp)
+        k = min(k, len(self.companies) - 1)
+        if k < 1:
+            return np.empty((len(queries), 0), dtype=np.intp)
+        step = max(1, BLOCK_SIZE // max(len(self.companies), 1))
+        nearest = np.empty((len(queries), k), dtype=np.intp)
+        for start in range(0, len(queries), step):
+            block = queries[start:start + step]
+            distances = self.norms[block, None] + self.norms[None, :] - 2 * self.vectors[block] @ self.vectors.T
+            distances[np.arange(len(block)), block] = np.inf
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            order = np.argsort(np.take_along_axis(distances, candidates, axis=1), axis=1)
+            nearest[start:start + step] = np.take_along_axis(candidates, order, axis=1)
+        return nearest
+
+# Peer index per data version, shared across sessions (not copied per call)
+@per_version
+@st.cache_resource(max_entries=4, show_spinner=False)
+def peer_index(version, impute=False):
+    return PeerIndex(load_enriched_data(impute=impute, version=version))
+
+def current_peer_index(impute=False):
+    return peer_index(data_version(), impute)
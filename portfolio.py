@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import CARBON_PRICE, DEFAULT_SCOPES, data_version, load_enriched_data, per_version, select_scopes
+
+# Holdings-based analysis. A holdings file has one row per position:
+#   ticker (or stock_ticker)        required
+#   weight or position_value        required (either)
+#   exchange                        optional, disambiguates tickers
+#   portfolio                       optional, many portfolios in one file
+# Holdings are kept as sparse (portfolio, company, weight) triplets, so
+# evaluating any number of portfolios is one scatter-add over the metrics.
+# The metrics are weighted averages of the companies' figures (the
+# portfolio's average company), not financed emissions: attributing a
+# company's emissions to a position needs its enterprise value (EVIC) or
+# market cap, which the dataset doesn't have.
+
+PORTFOLIO_METRICS = {
+    'total_emissions': 'Weighted Avg. Emissions (MT CO₂e)',
+    'monetized_all_scope_emissions': 'Weighted Avg. Monetized Emissions ($B)',
+    'ebitda_2022': 'Weighted Avg. EBITDA ($B)',
+    'ebitda_minus_monetized_emissions': 'Weighted Avg. Net EBITDA ($B)',
+    'emissions_per_billion_ebitda': 'Weighted Avg. Intensity (MT CO₂e/B$)',
+    'monetized_share_of_ebitda': 'Weighted Avg. EBITDA Wiped Out (%)',
+}
+# Totals in the holdings' own currency, for holdings with position values
+VALUE_METRICS = {
+    'position_value': 'Position Value',
+    'covered_value': 'Covered Value',
+    'value_wiped_out': 'Value × EBITDA Wiped Out',
+}
+DEFAULT_PORTFOLIO = 'Portfolio'
+
+def normalize_ticker(values):
+    return pd.Series(values, dtype=object).astype(str).str.strip().str.upper()
+
+# Lookup tables from ticker, and from (ticker, exchange), to dataset row
+@per_version
+@st.cache_data(max_entries=8, show_spinner=False)
+def ticker_index(version, impute=False):
+    data = load_enriched_data(impute=impute, version=version)
+    tickers = normalize_ticker(data['stock_ticker'].to_numpy())
+    exchanges = normalize_ticker(data['exchange'].to_numpy())
+    positions = pd.Series(np.arange(len(data)))
+    by_ticker = positions.groupby(tickers.to_numpy()).first()
+    by_listing = positions.groupby([tickers.to_numpy(), exchanges.to_numpy()]).first()
+    return by_ticker, by_listing
+
+# Validate a holdings frame and normalize its column names
+def read_holdings(holdings):
+    holdings = holdings.rename(columns=lambda c: str(c).strip().lower()).rename(
+        columns={'stock_ticker': 'ticker', 'value': 'position_value', 'market_value': 'position_value'})
+    if 'ticker' not in holdings:
+        raise ValueError('Holdings need a "ticker" column.')
+    if 'weight' not in holdings and 'position_value' not in holdings:
+        raise ValueError('Holdings need a "weight" or "position_value" column.')
+    if 'portfolio' not in holdings:
+        holdings['portfolio'] = DEFAULT_PORTFOLIO
+    amount = holdings['weight'] if 'weight' in holdings else holdings['position_value']
+    holdings['amount'] = pd.to_numeric(amount, errors='coerce')
+    values = holdings[['amount']]
+    if 'position_value' in holdings:
+        holdings['position_value'] = pd.to_numeric(holdings['position_value'], errors='coerce')
+        values = holdings[['amount', 'position_value']]
+    if values.isna().any().any() or (values < 0).any().any():
+        raise ValueError('Weights and position values must be non-negative numbers.')
+    holdings['portfolio'] = holdings['portfolio'].astype(str)
+    return holdings
+
+# Dataset row for every holding (-1 when the ticker isn't covered)
+def match_holdings(holdings, by_ticker, by_listing):
+    tickers = normalize_ticker(holdings['ticker'].to_numpy())
+    rows = tickers.map(by_ticker).to_numpy(dtype=float)
+    if 'exchange' in holdings:
+        listing = pd.MultiIndex.from_arrays([tickers.to_numpy(), normalize_ticker(holdings['exchange'].to_numpy())])
+        exact = by_listing.reindex(listing).to_numpy(dtype=float)
+        rows = np.where(np.isnan(exact), rows, exact)
+    return np.where(np.isnan(rows), -1, rows).astype(np.intp)
+
+# Weighted metrics for every portfolio at once. Weights are normalized within
+# each portfolio over the holdings that have a value for the metric, so
+# coverage gaps don't read as zero emissions.
+def evaluate_portfolios(holdings, data, rows):
+    portfolios, portfolio_of = np.unique(holdings['portfolio'].to_numpy(), return_inverse=True)
+    amount = holdings['amount'].to_numpy(dtype=float)
+    matched = rows >= 0
+    p, c, w = portfolio_of[matched], rows[matched], amount[matched]
+
+    metrics = data[list(PORTFOLIO_METRICS)].to_numpy(dtype=float)[c]     # holdings x metrics
+    present = np.isfinite(metrics)
+    weighted = np.zeros((len(portfolios), metrics.shape[1]))
+    covered = np.zeros_like(weighted)
+    np.add.at(weighted, p, np.where(present, w[:, None] * metrics, 0))
+    np.add.at(covered, p, np.where(present, w[:, None], 0))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = pd.DataFrame(weighted / covered, index=portfolios, columns=list(PORTFOLIO_METRICS))
+        coverage = np.bincount(p, weights=w, minlength=len(portfolios)) / \
+            np.bincount(portfolio_of, weights=amount, minlength=len(portfolios))
+    result.insert(0, 'holdings', np.bincount(portfolio_of, minlength=len(portfolios)))
+    result.insert(1, 'coverage', coverage)
+
+    # Value-scaled totals: each position's value, and that value scaled by the
+    # share of its company's EBITDA that monetized emissions wipe out
+    if 'position_value' in holdings:
+        value = holdings['position_value'].to_numpy(dtype=float)
+        share = data['monetized_share_of_ebitda'].to_numpy(dtype=float)[c] / 100
+        result['position_value'] = np.bincount(portfolio_of, weights=value, minlength=len(portfolios))
+        result['covered_value'] = np.bincount(p, weights=value[matched], minlength=len(portfolios))
+        result['value_wiped_out'] = np.bincount(p, weights=np.where(np.isfinite(share), value[matched] * share, 0),
+                                                minlength=len(portfolios))
+    result.index.name = 'portfolio'
+    return result
+
+# Evaluate a holdings file against the current dataset; returns the
+# per-portfolio table and the holdings with their matched company
+def analyse_holdings(holdings, carbon_price=CARBON_PRICE, impute=False, scopes=DEFAULT_SCOPES):
+    holdings = read_holdings(holdings)
+    version = data_version()
+    data = select_scopes(load_enriched_data(carbon_price, impute, version), scopes)
+    rows = match_holdings(holdings, *ticker_index(version, impute))
+    holdings['company_name'] = np.where(rows >= 0, data['company_name'].to_numpy()[rows], None)
+    return evaluate_portfolios(holdings, data, rows), holdings
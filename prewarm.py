@@ -0,0 +1,102 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+from dataset import CARBON_PRICE, load_enriched_data, sector_metrics
+from leaderboard import LEADERBOARD_METRICS, leaderboard
+from models import current_sector_models
+from peers import current_peer_index
+from render_pool import static_charts
+from sensitivity import current_sensitivity_table
+from stats import current_correlation_summary, current_sector_correlations
+from stress import current_stress_results
+from valuation import current_framework_values
+
+logger = logging.getLogger(__name__)
+
+# Company selections whose static charts are rendered ahead of time, one
+# list of names per selection
+POPULAR_SELECTIONS_FILE = os.environ.get(
+    'GHG_POPULAR_SELECTIONS',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'popular_selections.json')
+)
+
+# Popular selections from the config file (missing file -> none)
+def load_popular_selections(path=POPULAR_SELECTIONS_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)['selections']
+    except FileNotFoundError:
+        return []
+
+# Fill the data and aggregate caches behind the default view (default
+# carbon price, scope variant and framework, no imputation), keyed exactly
+# as the app's first rerun asks for them, then render the static charts of
+# the popular selections for Static mode. Every sector's charts are
+# rendered too only if asked: there are many, and the default view draws
+# interactive charts in the browser. Returns the seconds spent per stage
+# and in total.
+def prewarm(selections=None, carbon_price=CARBON_PRICE, sectors=False):
+    timings = {}
+    start = time.perf_counter()
+
+    stage = time.perf_counter()
+    data = load_enriched_data(carbon_price)
+    timings['data'] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    sector_metrics()
+    current_correlation_summary()
+    current_sector_correlations()
+    current_sector_models()
+    current_peer_index()
+    current_stress_results()
+    current_sensitivity_table(carbon_price)
+    current_framework_values()
+    leaderboard(next(iter(LEADERBOARD_METRICS)), None, 20, True, carbon_price)
+    timings['aggregates'] = time.perf_counter() - stage
+
+    companies = set(data['company_name'])
+    selections = load_popular_selections() if selections is None else selections
+    if sectors:
+        selections = [list(names) for _, names in data.groupby('sector')['company_name']] + selections
+
+    stage = time.perf_counter()
+    for selection in selections:
+        selection = [name for name in selection if name in companies]
+        if selection:
+            static_charts(selection, carbon_price)
+    timings['charts'] = time.perf_counter() - stage
+
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+# Warm the caches once per server process, in the background. serve.py
+# starts this when the server starts, before any session; under a plain
+# `streamlit run app.py` the first session starts it. The returned dict
+# gains 'timings' when done.
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    report = {}
+
+    def run():
+        report['timings'] = prewarm()
+        logger.info('Cache warm-up finished in %.2fs', report['timings']['total'])
+
+    if os.environ.get('GHG_PREWARM', '1') != '0':
+        threading.Thread(target=run, name='prewarm', daemon=True).start()
+    return report
+
+# `python prewarm.py` times each warm-up stage in a process of its own (it
+# doesn't warm a running server; serve.py does that at startup)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the server cache warm-up.')
+    parser.add_argument('--sectors', action='store_true', help="also render every sector's static charts")
+    args = parser.parse_args()
+    for name, seconds in prewarm(sectors=args.sectors).items():
+        print(f'{name:>10}: {seconds:.2f}s')
@@ -0,0 +1,96 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Bundled reference tables (data/reference): the SICS hierarchy (the
+# dataset's sics_sector codes -> sub-industry -> SASB industry -> sector) and
+# ISO 3166 countries with their UN M49 region and subregion. Each table is
+# loaded once per process into a hash index on its key, so joining it onto a
+# dataset is one hash lookup per row plus array takes, with no merge.
+
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'reference')
+
+# Hierarchies, coarsest level first: column -> label
+SICS_LEVELS = {
+    'sics_sector_name': 'SICS sector',
+    'sics_industry': 'SICS industry',
+    'sics_sub_industry': 'SICS sub-industry',
+}
+REGION_LEVELS = {
+    'region': 'Region',
+    'subregion': 'Subregion',
+    'headquarters_country': 'Country',
+}
+HIERARCHIES = {'sics': SICS_LEVELS, 'region': REGION_LEVELS}
+
+class ReferenceIndex:
+    def __init__(self, table, key, normalize=None):
+        self.index = pd.Index(table[key])
+        self.index.get_indexer(self.index[:1])  # build the hash table now rather than on first join
+        self.normalize = normalize
+        # Each column ends with a missing value, which position -1 (not found) selects
+        self.columns = {column: np.append(table[column].to_numpy(dtype=object), np.nan)
+                        for column in table.columns if column != key}
+
+    # Reference columns for each key (missing where the key isn't in the
+    # table). Keys repeat a lot, so each distinct key is normalized and
+    # looked up once.
+    def join(self, keys):
+        codes, distinct = pd.factorize(keys)
+        if self.normalize is not None:
+            distinct = self.normalize(distinct)
+        positions = np.append(self.index.get_indexer(distinct), -1)[codes]
+        return {column: values[positions] for column, values in self.columns.items()}
+
+# SICS codes with their full hierarchy (sub-industry, industry, sector), and
+# ISO 3166 codes with region and subregion. sics_codes.csv only maps the
+# dataset's codes seen so far; other codes roll up as 'Unclassified' until
+# they are added there (see sics_code_count).
+@st.cache_resource
+def reference_indexes():
+    codes = pd.read_csv(os.path.join(REFERENCE_DIR, 'sics_codes.csv'))
+    industries = pd.read_csv(os.path.join(REFERENCE_DIR, 'sics_industries.csv'))
+    sics = codes.merge(industries, on='industry_code', how='left').rename(columns={
+        'sub_industry': 'sics_sub_industry', 'industry': 'sics_industry', 'sector': 'sics_sector_name'})
+    countries = pd.read_csv(os.path.join(REFERENCE_DIR, 'iso3166.csv'), keep_default_na=False)  # 'NA' is Namibia
+    return (ReferenceIndex(sics[['sics_sector', *SICS_LEVELS]], 'sics_sector',
+                           lambda codes: pd.to_numeric(codes, errors='coerce').round()),
+            ReferenceIndex(countries[['iso_3166_code', 'region', 'subregion']], 'iso_3166_code',
+                           lambda codes: codes.astype(str).str.strip().str.upper()))
+
+# pandas' default missing values for read_csv
+MISSING_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                  '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# read_csv options for dataset CSVs with these columns: the default missing
+# values, except that only an empty iso_3166_code is missing ('NA' is
+# Namibia, as in iso3166.csv)
+def csv_missing_values(columns):
+    return {'keep_default_na': False,
+            'na_values': {column: [''] if column == 'iso_3166_code' else MISSING_VALUES for column in columns}}
+
+# A dataset CSV (a path, or its content as bytes) read with csv_missing_values
+def read_dataset_csv(source):
+    opened = (lambda: io.BytesIO(source)) if isinstance(source, bytes) else (lambda: source)
+    columns = pd.read_csv(opened(), nrows=0).columns
+    return pd.read_csv(opened(), **csv_missing_values(columns))
+
+# Number of sics_sector codes the bundled SICS table maps
+def sics_code_count():
+    return len(reference_indexes()[0].index)
+
+# The dataset with the SICS and region hierarchy columns added
+def join_reference(data):
+    sics, countries = reference_indexes()
+    return data.assign(**sics.join(data['sics_sector']), **countries.join(data['iso_3166_code']))
+
+# Totals of columns at one level of a hierarchy, keyed by that level and
+# every coarser one (so 'subregion' rows also carry their region). Codes
+# missing from the reference tables roll up as 'Unclassified'.
+def rollup(data, level, columns, agg='sum'):
+    levels = next(list(levels) for levels in HIERARCHIES.values() if level in levels)
+    keys = levels[:levels.index(level) + 1]
+    return data.assign(**{key: data[key].fillna('Unclassified') for key in keys}).groupby(keys)[columns].agg(agg)
@@ -0,0 +1,199 @@
+import argparse
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from reference import read_dataset_csv
+from snapshots import SNAPSHOT_DIR, content_hash, read_snapshot, write_snapshot
+
+# Background refresh of the source dataset. The source is polled with
+# conditional requests (If-None-Match / If-Modified-Since) over one pooled
+# session, so an unchanged file costs a 304 and no download; a changed file
+# is parsed and stored as a snapshot off the request path, then swapped in
+# as one (version, data) reference. Readers always get the last complete
+# dataset and never wait on the network, except on the very first start of
+# a server with no stored snapshot for the source.
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = float(os.environ.get('GHG_REFRESH_INTERVAL', 300))  # seconds, 0 checks once at start
+REQUEST_TIMEOUT = 30    # seconds per request
+STATE_FILE = 'source.json'  # last version and validators per source, in the snapshot directory
+
+# One keep-alive session with a small connection pool, retrying transient
+# server errors with backoff
+def pooled_session(pool_size=4):
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# A source's content as a frame: a CSV, or Parquet as written by ingest.py
+def read_source(content):
+    if content[:4] == b'PAR1':
+        return pd.read_parquet(io.BytesIO(content))
+    return read_dataset_csv(content)
+
+class DataRefresher:
+    def __init__(self, source, interval=REFRESH_INTERVAL, session=None, directory=SNAPSHOT_DIR):
+        self.source = source
+        self.interval = interval
+        self.session = session or pooled_session()
+        self.directory = directory
+        self.current = None     # (version, data), replaced as a whole
+        self.validators = {}    # ETag / Last-Modified (or mtime for a local file) of the current data
+        self.checked = None     # time of the last completed check
+        self.error = None       # error from the last check, if it failed
+        self.listeners = []     # called with (version, data) whenever a new version is swapped in
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def remote(self):
+        return self.source.startswith(('http://', 'https://'))
+
+    # Serve the last stored snapshot of the source at once (or fetch it if
+    # there is none), then poll in the background. Without polling the
+    # source is checked once, here.
+    def start(self):
+        self._restore()
+        if self.current is None or self.interval <= 0:
+            self.check()
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name='refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    # A restored snapshot is checked straight away, then every interval
+    def _poll(self):
+        if self.checked is None:
+            self.check()
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    # Fetch the source if it changed and swap it in. Returns True if the
+    # dataset changed. Failures keep the current dataset (and are raised
+    # only when there is none to keep).
+    def check(self):
+        try:
+            content, validators = self._fetch()
+            if content is None:
+                return False
+            data = read_source(content)
+            version = self._store(data, validators)
+        except (requests.RequestException, OSError, ValueError) as error:
+            self.error = error
+            if self.current is None:
+                raise
+            return False
+        finally:
+            self.checked = time.time()
+
+        self.error = None
+        changed = self.current is None or self.current[0] != version
+        self.validators = validators
+        if changed:
+            self._swap(version, data)
+        return changed
+
+    # Tell the listeners about a new version, then make it current, so state
+    # they derive from it (see dataset.track_source) is ready by the time
+    # sessions see it. They run here, on the refresh thread, off the request
+    # path; a failing listener doesn't stop the swap.
+    def _swap(self, version, data):
+        for listener in self.listeners:
+            try:
+                listener(version, data)
+            except Exception:
+                logger.exception('Refresh listener failed for version %s', version)
+        self.current = (version, data)
+
+    # New content and its validators, or (None, None) if unchanged
+    def _fetch(self):
+        if not self.remote:
+            mtime = os.path.getmtime(self.source)
+            if self.current is not None and self.validators.get('mtime') == mtime:
+                return None, None
+            with open(self.source, 'rb') as f:
+                return f.read(), {'mtime': mtime}
+
+        headers = {}
+        if self.current is not None:
+            if self.validators.get('etag'):
+                headers['If-None-Match'] = self.validators['etag']
+            if self.validators.get('last_modified'):
+                headers['If-Modified-Since'] = self.validators['last_modified']
+        response = self.session.get(self.source, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            return None, None
+        response.raise_for_status()
+        return response.content, {'etag': response.headers.get('ETag'),
+                                  'last_modified': response.headers.get('Last-Modified')}
+
+    # Store the dataset as a snapshot and record it as the source's latest
+    def _store(self, data, validators):
+        try:
+            version = write_snapshot(data, self.directory)
+        except OSError:
+            # Read-only deployments still get a content-derived version
+            return content_hash(data)
+        states = self._states()
+        states[self.source] = {'version': version, 'validators': validators}
+        path = os.path.join(self.directory, STATE_FILE)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(states, f, indent=2)
+        os.replace(temporary, path)
+        return version
+
+    def _states(self):
+        try:
+            with open(os.path.join(self.directory, STATE_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    # Pick up the source's last snapshot and validators from disk
+    def _restore(self):
+        state = self._states().get(self.source)
+        if state is None:
+            return
+        try:
+            data = read_snapshot(state['version'], self.directory)
+        except OSError:
+            return
+        self.validators = state['validators']
+        self._swap(state['version'], data)
+
+# `python refresh.py URL` checks a source once, or every --interval seconds
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check a dataset source for changes with conditional requests.')
+    parser.add_argument('source', help='CSV or Parquet URL or path')
+    parser.add_argument('--interval', type=float, default=0, help='keep polling every N seconds')
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help='snapshot directory')
+    args = parser.parse_args()
+
+    refresher = DataRefresher(args.source, interval=0, directory=args.dir)
+    refresher._restore()
+    while True:
+        start = time.perf_counter()
+        changed = refresher.check()
+        elapsed = time.perf_counter() - start
+        print(f"{'Changed' if changed else 'Unchanged'}: {refresher.current[0]} "
+              f'({len(refresher.current[1])} rows, {elapsed:.3f}s)')
+        if not args.interval:
+            break
+        time.sleep(args.interval)
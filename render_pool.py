@@ -0,0 +1,141 @@
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, wait
+
+import streamlit as st
+
+from charts import (financial_impact_figure, geographic_figure, scope_breakdown_figure, sector_scatter_figure,
+                    tornado_figure)
+from dataset import CARBON_PRICE, DEFAULT_SCOPES, SCOPE_VARIANTS, data_version, load_enriched_data, select_scopes
+from models import fit_lines, sector_models
+from sensitivity import sensitivity_table, tornado_rows
+from valuation import DEFAULT_FRAMEWORK, VALUATION_FRAMEWORKS, apply_framework, framework_values
+
+# Static charts are rendered in worker processes so the tabs' figures are
+# built concurrently instead of one after another on the script thread
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_TIMEOUT = 20  # seconds for the whole batch
+RENDER_DPI = 150
+
+# Static chart for each tab (and the Financial Impact tab's tornado chart)
+STATIC_CHARTS = {
+    'scope': scope_breakdown_figure,
+    'financial': financial_impact_figure,
+    'geographic': geographic_figure,
+    'sector': sector_scatter_figure,
+    'tornado': tornado_figure,
+}
+
+# Inputs each static chart depends on besides the data version, companies
+# and imputation
+CHART_DEPENDENCIES = {
+    'scope': (),
+    'financial': ('carbon_price', 'scopes', 'framework'),
+    'geographic': (),
+    'sector': ('fit_method',),
+    'tornado': ('carbon_price', 'scopes', 'framework', 'sensitivity_company'),
+}
+MAX_CACHED_CHARTS = 1024
+
+# Worker start-up: headless backend, no display needed
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+# Build one figure in a worker and return it as PNG or SVG bytes
+def _render(builder, data, fmt):
+    import matplotlib.pyplot as plt
+
+    fig = builder(data)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=RENDER_DPI, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+# One pool per server process, shared by all sessions. Workers are spawned
+# rather than forked so they don't inherit the server's threads.
+@st.cache_resource
+def get_render_pool():
+    return ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker)
+
+# Render {name: (builder, data)} concurrently. Charts that fail or miss the
+# timeout come back as None so the caller can show a placeholder.
+def render_charts(jobs, fmt='png', timeout=RENDER_TIMEOUT):
+    pool = get_render_pool()
+    try:
+        futures = {name: pool.submit(_render, builder, data, fmt) for name, (builder, data) in jobs.items()}
+    except RuntimeError:
+        # Shut-down or broken pool: start a fresh one on the next rerun
+        get_render_pool.clear()
+        return dict.fromkeys(jobs)
+
+    wait(futures.values(), timeout=timeout)
+    images = {}
+    for name, future in futures.items():
+        images[name] = None
+        if not future.done():
+            future.cancel()
+        elif future.exception() is None:
+            images[name] = future.result()
+        elif isinstance(future.exception(), BrokenExecutor):
+            get_render_pool.clear()
+    return images
+
+# Chart images shared by all sessions, keyed per chart by only the inputs
+# it depends on, least recently used evicted first
+@st.cache_resource
+def _chart_cache():
+    return OrderedDict(), threading.Lock()
+
+# Static charts for a selection of companies. Each chart is cached on its
+# own key, so changing a control re-renders only the charts that use it
+# (a carbon price change redraws the financial and tornado charts, not the
+# other three). The tornado chart is for one company of the selection and
+# is left out without one.
+def static_charts(companies, carbon_price=CARBON_PRICE, fit_method=None, impute=False, scopes=DEFAULT_SCOPES,
+                  framework=DEFAULT_FRAMEWORK, sensitivity_company=None):
+    companies = tuple(sorted(companies))
+    settings = {'carbon_price': carbon_price, 'fit_method': fit_method, 'scopes': scopes, 'framework': framework,
+                'sensitivity_company': sensitivity_company}
+    version = data_version()
+    keys = {name: (name, version, companies, impute, *(settings[setting] for setting in inputs))
+            for name, inputs in CHART_DEPENDENCIES.items() if name != 'tornado' or sensitivity_company is not None}
+
+    cache, lock = _chart_cache()
+    with lock:
+        images = {name: cache.get(key) for name, key in keys.items()}
+        for key in keys.values():
+            if key in cache:
+                cache.move_to_end(key)
+    missing = [name for name, image in images.items() if image is None]
+    if not missing:
+        return images
+
+    data = select_scopes(load_enriched_data(carbon_price, impute, version), scopes)
+    selection = data[data['company_name'].isin(companies)]
+    jobs = {name: (STATIC_CHARTS[name], selection) for name in missing}
+    if fit_method and 'sector' in jobs:
+        lines = fit_lines(sector_models(version, impute)[0], selection, 'intensity', fit_method)
+        jobs['sector'] = (partial(sector_scatter_figure, lines=lines), selection)
+    if framework != DEFAULT_FRAMEWORK and 'financial' in jobs:
+        block = framework_values(version, impute)[list(SCOPE_VARIANTS).index(scopes)]
+        monetized = block[list(VALUATION_FRAMEWORKS).index(framework), data.index.get_indexer(selection.index)]
+        jobs['financial'] = (financial_impact_figure, apply_framework(selection, monetized))
+    if 'tornado' in jobs:
+        table = sensitivity_table(version, carbon_price, impute, scopes, framework)
+        jobs['tornado'] = (tornado_figure, tornado_rows(table, sensitivity_company))
+
+    # Charts that failed or timed out aren't cached, so the next rerun retries them
+    rendered = render_charts(jobs)
+    images.update(rendered)
+    with lock:
+        cache.update((keys[name], image) for name, image in rendered.items() if image is not None)
+        while len(cache) > MAX_CACHED_CHARTS:
+            cache.popitem(last=False)
+    return images
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import (CARBON_PRICE, DEFAULT_SCOPES, SCOPE_INCLUSION, SCOPE_VARIANTS, data_version, load_enriched_data,
+                     monetize, per_version)
+from valuation import DEFAULT_FRAMEWORK, VALUATION_FRAMEWORKS, price_tensor
+
+# One-at-a-time sensitivity of net EBITDA (EBITDA minus monetized emissions)
+# to its inputs, under the selected scope variant and valuation framework.
+# Every input of every company is perturbed at every step in one broadcast
+# evaluation; the tornado chart for a company is then a lookup.
+
+SENSITIVITY_INPUTS = {
+    'scope_1_emissions': 'Scope 1',
+    'scope_2_emissions': 'Scope 2',
+    'scope_3_emissions': 'Scope 3',
+    'ebitda_2022': 'EBITDA',
+    'carbon_price': 'Carbon price',
+    'fx_rate': 'FX rate',
+}
+# Relative perturbations of each input (the tornado uses the two ends)
+SENSITIVITY_STEPS = np.array([-0.2, -0.1, -0.05, 0.05, 0.1, 0.2])
+
+# Net EBITDA from an (..., inputs) array, with prices per company and scope
+# (USD per tonne, 0 where a scope isn't monetized) that the carbon price
+# input scales. The FX multiplier only moves EBITDA reported in a currency
+# other than USD; a missing scope propagates as NaN only where it is
+# monetized, as in dataset.variant_emissions.
+def net_ebitda(inputs, foreign, prices):
+    scope_1, scope_2, scope_3, ebitda, price, fx = np.moveaxis(inputs, -1, 0)
+    ebitda = ebitda * np.where(foreign, fx, 1)
+    priced = sum(np.where(prices[:, s] > 0, scope * prices[:, s], 0)
+                 for s, scope in enumerate((scope_1, scope_2, scope_3)))
+    return ebitda - monetize(priced, price)
+
+# Per-company, per-scope prices for a scope variant under a valuation
+# framework (the default framework is the sidebar carbon price)
+def scope_prices(data, carbon_price=CARBON_PRICE, scopes=DEFAULT_SCOPES, framework=DEFAULT_FRAMEWORK):
+    if framework == DEFAULT_FRAMEWORK:
+        prices = np.full((len(data), 3), float(carbon_price))
+    else:
+        prices = price_tensor(data['iso_3166_code'].to_numpy())[list(VALUATION_FRAMEWORKS).index(framework)]
+    return prices * SCOPE_INCLUSION[list(SCOPE_VARIANTS).index(scopes)]
+
+# Net EBITDA at every step for every input: (companies x inputs x steps)
+# evaluations from one (steps x inputs x companies x inputs) tensor. The
+# carbon price input is a multiplier on the scope prices.
+def sensitivity_tensor(data, carbon_price=CARBON_PRICE, scopes=DEFAULT_SCOPES, framework=DEFAULT_FRAMEWORK,
+                       steps=SENSITIVITY_STEPS):
+    base = np.column_stack([
+        data[['scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions', 'ebitda_2022']].to_numpy(dtype=float),
+        np.ones(len(data)),
+        np.ones(len(data)),
+    ])
+    foreign = (data['ebitda_currency'].fillna('USD').str.upper() != 'USD').to_numpy()
+    prices = scope_prices(data, carbon_price, scopes, framework)
+    n_inputs = base.shape[1]
+    scale = 1 + steps[:, None, None] * np.eye(n_inputs)[None, :, :]      # steps x inputs x inputs
+    perturbed = base[None, None, :, :] * scale[:, :, None, :]             # steps x inputs x companies x inputs
+    values = net_ebitda(perturbed, foreign, prices)                       # steps x inputs x companies
+    return net_ebitda(base, foreign, prices), values.transpose(2, 1, 0)
+
+# Long table of sensitivities per company and input, per data version,
+# scope variant and framework: net EBITDA at the low and high end of the
+# range, the swing between them, and the central finite-difference
+# elasticity at the smallest step
+@per_version
+@st.cache_data(max_entries=16, show_spinner=False)
+def sensitivity_table(version, carbon_price=CARBON_PRICE, impute=False, scopes=DEFAULT_SCOPES,
+                      framework=DEFAULT_FRAMEWORK):
+    data = load_enriched_data(carbon_price, impute, version)
+    base, values = sensitivity_tensor(data, carbon_price, scopes, framework)
+    inner = np.searchsorted(SENSITIVITY_STEPS, 0)
+    h = SENSITIVITY_STEPS[inner]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        elasticity = (values[:, :, inner] - values[:, :, inner - 1]) / (2 * h) / np.abs(base)[:, None]
+
+    n, m = values.shape[:2]
+    return pd.DataFrame({
+        'company_name': np.repeat(data['company_name'].to_numpy(), m),
+        'input': np.tile(list(SENSITIVITY_INPUTS.values()), n),
+        'base': np.repeat(base, m),
+        'low': values[:, :, 0].ravel(),
+        'high': values[:, :, -1].ravel(),
+        'swing': np.abs(values[:, :, -1] - values[:, :, 0]).ravel(),
+        'elasticity': elasticity.ravel(),
+    })
+
+def current_sensitivity_table(carbon_price=CARBON_PRICE, impute=False, scopes=DEFAULT_SCOPES,
+                              framework=DEFAULT_FRAMEWORK):
+    return sensitivity_table(data_version(), carbon_price, impute, scopes, framework)
+
+# Tornado rows for one company, largest swing first
+def tornado_rows(table, company):
+    rows = table[table['company_name'] == company]
+    return rows.sort_values('swing', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,16 @@
+from contextlib import asynccontextmanager
+
+import streamlit as st
+
+# Server entry point that warms the shared caches at startup: `streamlit run
+# serve.py` (or `uvicorn serve:app`) serves app.py and starts the cache
+# warm-up as soon as the runtime is up, so the first session finds them
+# warm instead of computing them itself.
+
+@asynccontextmanager
+async def warm_caches(app):
+    from prewarm import start_prewarm  # imported once the runtime (and its caches) exists
+    start_prewarm()
+    yield
+
+app = st.App('app.py', lifespan=warm_caches)
@@ -0,0 +1,131 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from entities import deduplicate
+from reference import read_dataset_csv
+
+# Content-addressed dataset snapshots. Every dataset the app loads is
+# stored once as an immutable Parquet file named by the hash of its
+# contents; that hash is the data version used in cache keys, so two
+# sessions (or servers) that loaded the same data share cache entries and
+# any change to the data gets new keys. Run `python snapshots.py diff A B`
+# to compare two snapshots.
+
+SNAPSHOT_DIR = os.environ.get(
+    'GHG_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshots')
+)
+
+# Hash of the column names, dtypes and every row's values
+def content_hash(data):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in data.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def snapshot_path(snapshot_id, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, f'{snapshot_id}.parquet')
+
+# Store a dataset (no-op if that content is already stored); returns its id.
+# Written to a temporary file and renamed, so readers never see a partial file.
+def write_snapshot(data, directory=SNAPSHOT_DIR):
+    snapshot_id = content_hash(data)
+    path = snapshot_path(snapshot_id, directory)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        data.to_parquet(temporary, index=False)
+        os.replace(temporary, path)
+    return snapshot_id
+
+def read_snapshot(snapshot_id, directory=SNAPSHOT_DIR):
+    return pd.read_parquet(snapshot_path(snapshot_id, directory))
+
+# Stored snapshots, oldest first
+def list_snapshots(directory=SNAPSHOT_DIR):
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.parquet')]
+    except FileNotFoundError:
+        return pd.DataFrame(columns=['snapshot', 'created', 'bytes'])
+    paths = [os.path.join(directory, name) for name in names]
+    return pd.DataFrame({
+        'snapshot': [name.removesuffix('.parquet') for name in names],
+        'created': pd.to_datetime([os.path.getmtime(path) for path in paths], unit='s'),
+        'bytes': [os.path.getsize(path) for path in paths],
+    }).sort_values('created', ignore_index=True)
+
+# Stable row keys: the resolved company_id (see entities.py), or for data
+# without one the company name, with '#2', '#3'... for repeats
+def row_keys(data):
+    if 'company_id' in data:
+        return pd.Index(data['company_id'], name='key')
+    names = data['company_name'].astype(str)
+    repeat = names.groupby(names).cumcount()
+    return pd.Index(np.where(repeat > 0, names + '#' + (repeat + 1).astype(str), names), name='key')
+
+def row_hashes(data):
+    return pd.Series(pd.util.hash_pandas_object(data, index=False).to_numpy(), index=row_keys(data))
+
+# Keys added, removed and changed between two sets of row hashes
+def diff_rows(old_hashes, new_hashes):
+    added = new_hashes.index.difference(old_hashes.index)
+    removed = old_hashes.index.difference(new_hashes.index)
+    common = new_hashes.index.intersection(old_hashes.index)
+    changed = common[old_hashes[common].to_numpy() != new_hashes[common].to_numpy()]
+    return added, removed, changed
+
+# Companies added, removed and changed between two datasets, and every
+# changed cell (key, column, old value, new value) of the changed companies.
+# Duplicate rows are resolved first, so a company is one row keyed by its
+# company_id, whichever name or ticker variant it appears under.
+def diff_snapshots(old, new):
+    old, new = deduplicate(old), deduplicate(new)
+    old_hashes, new_hashes = row_hashes(old), row_hashes(new)
+    added, removed, changed = diff_rows(old_hashes, new_hashes)
+    columns = [column for column in new.columns if column in old.columns]
+    before = old.set_axis(old_hashes.index).loc[changed, columns].astype(object)
+    after = new.set_axis(new_hashes.index).loc[changed, columns].astype(object)
+    differs = (~((before == after) | (before.isna() & after.isna()))).to_numpy()
+    rows, cols = differs.nonzero()
+    cells = pd.DataFrame({
+        'key': changed[rows],
+        'column': pd.Index(columns)[cols],
+        'old': before.to_numpy()[rows, cols],
+        'new': after.to_numpy()[rows, cols],
+    })
+    return added, removed, changed, cells
+
+# A snapshot by id, or a CSV/Parquet file by path
+def resolve(name, directory=SNAPSHOT_DIR):
+    if os.path.exists(name):
+        return pd.read_parquet(name) if name.endswith('.parquet') else read_dataset_csv(name)
+    return read_snapshot(name, directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List and compare dataset snapshots.')
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help='snapshot directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list stored snapshots')
+    diff = commands.add_parser('diff', help='companies and cells that differ between two snapshots')
+    diff.add_argument('old', help='snapshot id or CSV/Parquet path')
+    diff.add_argument('new', help='snapshot id or CSV/Parquet path')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print(list_snapshots(args.dir).to_string(index=False))
+    else:
+        old, new = resolve(args.old, args.dir), resolve(args.new, args.dir)
+        added, removed, changed, cells = diff_snapshots(old, new)
+        for label, columns in [('Columns added', new.columns.difference(old.columns)),
+                               ('Columns removed', old.columns.difference(new.columns))]:
+            if len(columns):
+                print(f"{label}: {', '.join(columns)}")
+        for label, keys in [('Added', added), ('Removed', removed), ('Changed', changed)]:
+            print(f"{label} ({len(keys)}): {', '.join(keys[:20])}{'…' if len(keys) > 20 else ''}")
+        if len(cells):
+            print(cells.to_string(index=False))
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import data_version, load_enriched_data, per_version
+
+# Resampling settings for the correlation estimate
+RESAMPLES = 2000
+MIN_RESAMPLES = 200
+RESAMPLE_BUDGET = 10_000_000  # resampled values per estimate; large datasets get fewer resamples
+CONFIDENCE = 0.95
+BLOCK_SIZE = 2_000_000  # resampled values held in memory per block
+MIN_SECTOR_SIZE = 4
+
+# Row-wise Pearson correlation of two (resamples x n) matrices
+def rowwise_pearson(x, y):
+    x = x - x.mean(axis=1, keepdims=True)
+    y = y - y.mean(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+
+# Pearson correlation of two vectors
+def pearson(x, y):
+    return rowwise_pearson(x[None, :], y[None, :])[0]
+
+# Average ranks (ties share the mean rank), as used by Spearman
+def rank(values):
+    return pd.Series(values).rank().to_numpy()
+
+# Row-wise average ranks of values[idx] without sorting each row: values are
+# dense-ranked once, then per-row counts of each rank give the tie-averaged rank
+def rowwise_ranks(values, idx):
+    uniques, dense = np.unique(values, return_inverse=True)
+    m = len(uniques)
+    rows = idx.shape[0]
+    picked = dense[idx]
+    counts = np.bincount((picked + np.arange(rows)[:, None] * m).ravel(), minlength=rows * m).reshape(rows, m)
+    below = np.cumsum(counts, axis=1) - counts
+    average = below + (counts + 1) / 2
+    return np.take_along_axis(average, picked, axis=1)
+
+# Resamples for n observations: RESAMPLES, fewer once they would exceed
+# RESAMPLE_BUDGET values, but never below MIN_RESAMPLES
+def resample_count(n, resamples=RESAMPLES):
+    return min(resamples, max(MIN_RESAMPLES, RESAMPLE_BUDGET // max(n, 1)))
+
+# Rows of resample indices per block so a block stays within BLOCK_SIZE values
+def _blocks(resamples, n):
+    step = max(1, BLOCK_SIZE // max(n, 1))
+    for start in range(0, resamples, step):
+        yield min(step, resamples - start)
+
+# Bootstrap distribution of Pearson and Spearman: each block draws an index
+# matrix (one resample per row) and evaluates all its rows at once
+def bootstrap_correlations(x, y, resamples=RESAMPLES, seed=0):
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    pearson_samples, spearman_samples = [], []
+    for rows in _blocks(resamples, n):
+        idx = rng.integers(0, n, size=(rows, n))
+        pearson_samples.append(rowwise_pearson(x[idx], y[idx]))
+        spearman_samples.append(rowwise_pearson(rowwise_ranks(x, idx), rowwise_ranks(y, idx)))
+    return np.concatenate(pearson_samples), np.concatenate(spearman_samples)
+
+# Two-sided permutation p-values: y is shuffled independently in every row
+def permutation_pvalues(x, y, resamples=RESAMPLES, seed=1):
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    rx, ry = rank(x), rank(y)
+    observed = np.array([pearson(x, y), pearson(rx, ry)])
+    extreme = np.zeros(2)
+    for rows in _blocks(resamples, n):
+        perm = rng.random((rows, n)).argsort(axis=1)
+        null = np.stack([rowwise_pearson(np.broadcast_to(x, (rows, n)), y[perm]),
+                         rowwise_pearson(np.broadcast_to(rx, (rows, n)), ry[perm])])
+        extreme += (np.abs(null) >= np.abs(observed)[:, None]).sum(axis=1)
+    return (extreme + 1) / (resamples + 1)
+
+# Pairs tied within groups of equal values
+def tied_pairs(*columns):
+    _, counts = np.unique(np.column_stack(columns), axis=0, return_counts=True)
+    return (counts * (counts - 1) // 2).sum()
+
+# Pairs out of order in a sequence of integer ranks (0 <= rank < m), by a
+# bottom-up merge sort: at each level every element of a right-hand run
+# counts the larger elements of its left-hand run with one searchsorted
+# over all runs at once (each run's keys are offset by run * m)
+def inversions(ranks, m):
+    n = len(ranks)
+    position = np.arange(n)
+    total = 0
+    width = 1
+    while width < n:
+        run = position // (2 * width)
+        keys = run * m + ranks
+        right = (position // width) % 2 == 1
+        left_keys = keys[~right]
+        total += (np.searchsorted(left_keys, run[right] * m + m)
+                  - np.searchsorted(left_keys, keys[right], side='right')).sum()
+        ranks = np.sort(keys) - run * m
+        width *= 2
+    return int(total)
+
+# Kendall's tau-b in O(n log n) (Knight's algorithm): sorted by x (then y),
+# the discordant pairs are the inversions of y
+def kendall_tau(x, y):
+    n = len(x)
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    _, y_ranks = np.unique(y, return_inverse=True)
+    pairs = n * (n - 1) // 2
+    ties_x, ties_y, ties_xy = tied_pairs(x), tied_pairs(y), tied_pairs(x, y)
+    discordant = inversions(y_ranks, n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (pairs - ties_x - ties_y + ties_xy - 2 * discordant) / np.sqrt(
+            float(pairs - ties_x) * float(pairs - ties_y))
+
+# Percentile interval of a bootstrap distribution
+def percentile_interval(samples, confidence=CONFIDENCE):
+    tail = (1 - confidence) / 2 * 100
+    return tuple(np.nanpercentile(samples, [tail, 100 - tail]))
+
+# Correlation between sustainability performance (negated intensity) and
+# EBITDA with bootstrap intervals and permutation p-values. The number of
+# resamples used is in the table's attrs.
+def correlation_table(x, y, resamples=RESAMPLES):
+    resamples = resample_count(len(x), resamples)
+    boot_pearson, boot_spearman = bootstrap_correlations(x, y, resamples)
+    p_pearson, p_spearman = permutation_pvalues(x, y, resamples)
+    rows = [
+        ('Pearson', pearson(x, y), *percentile_interval(boot_pearson), p_pearson),
+        ('Spearman', pearson(rank(x), rank(y)), *percentile_interval(boot_spearman), p_spearman),
+        ('Kendall', kendall_tau(x, y), np.nan, np.nan, np.nan),
+    ]
+    table = pd.DataFrame(rows, columns=['method', 'estimate', 'ci_low', 'ci_high', 'p_value']).set_index('method')
+    table.attrs['resamples'] = resamples
+    return table
+
+# Paired, complete observations used for the correlation estimate
+def _performance_vs_ebitda(data):
+    pairs = data[['emissions_per_billion_ebitda', 'ebitda_2022']].replace([np.inf, -np.inf], np.nan).dropna()
+    return -pairs['emissions_per_billion_ebitda'].to_numpy(dtype=float), pairs['ebitda_2022'].to_numpy(dtype=float)
+
+# Whole-dataset estimate, cached per data version
+@per_version
+@st.cache_data(max_entries=8, show_spinner=False)
+def correlation_summary(version, impute=False, resamples=RESAMPLES):
+    x, y = _performance_vs_ebitda(load_enriched_data(impute=impute, version=version))
+    return correlation_table(x, y, resamples)
+
+# Pearson and Spearman per sector with bootstrap intervals, cached per data version
+@per_version
+@st.cache_data(max_entries=8, show_spinner=False)
+def sector_correlations(version, impute=False, resamples=RESAMPLES):
+    rows = []
+    for sector, group in load_enriched_data(impute=impute, version=version).groupby('sector'):
+        x, y = _performance_vs_ebitda(group)
+        if len(x) < MIN_SECTOR_SIZE:
+            continue
+        boot_pearson, _ = bootstrap_correlations(x, y, resample_count(len(x), resamples))
+        rows.append((sector, len(x), pearson(x, y), *percentile_interval(boot_pearson),
+                     pearson(rank(x), rank(y))))
+    return pd.DataFrame(rows, columns=['sector', 'companies', 'pearson', 'ci_low', 'ci_high', 'spearman'])
+
+# Convenience wrappers keyed on the current data version
+def current_correlation_summary(impute=False):
+    return correlation_summary(data_version(), impute)
+
+def current_sector_correlations(impute=False):
+    return sector_correlations(data_version(), impute)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import CARBON_PRICE, DEFAULT_SCOPES, data_version, metric_graph, monetize, per_version
+
+# Multi-year stress tests: carbon price paths x emission trajectories x
+# discount rates, applied to 2023 emissions from BASE_YEAR + 1 to END_YEAR.
+# Paths and trajectories are anchor points ({year: value}), linearly
+# interpolated between anchors and held flat after the last one.
+
+BASE_YEAR = 2023
+END_YEAR = 2050
+YEARS = np.arange(BASE_YEAR + 1, END_YEAR + 1)
+
+# Carbon price paths in USD per tonne (policy scenarios are illustrative)
+PRICE_PATHS = {
+    'Flat (IFVI)': {BASE_YEAR: CARBON_PRICE},
+    'Linear ramp (2x by 2050)': {BASE_YEAR: CARBON_PRICE, END_YEAR: 2 * CARBON_PRICE},
+    'Orderly transition': {BASE_YEAR: 60, 2030: 140, 2040: 250, END_YEAR: 400},
+    'Delayed transition': {BASE_YEAR: 60, 2030: 60, 2035: 300, END_YEAR: 600},
+    'Current policies': {BASE_YEAR: 60, END_YEAR: 80},
+}
+
+# Emissions relative to the reported year
+EMISSION_TRAJECTORIES = {
+    'Flat': {BASE_YEAR: 1.0},
+    'Linear -4.2%/yr (1.5°C-aligned)': {BASE_YEAR: 1.0, BASE_YEAR + 24: 0.0},
+    'Net zero by 2050': {BASE_YEAR: 1.0, END_YEAR: 0.0},
+}
+
+DISCOUNT_RATES = [0.015, 0.02, 0.025, 0.03, 0.05]
+
+# Anchor dicts -> (scenarios x years) matrix
+def interpolate_paths(anchors, years=YEARS):
+    return np.array([np.interp(years, list(points), list(points.values())) for points in anchors.values()])
+
+def discount_factors(rates=DISCOUNT_RATES, years=YEARS):
+    return (1 + np.asarray(rates))[:, None] ** -(years - BASE_YEAR)[None, :]
+
+# Discounted cost and NPV erosion for every company x price path x
+# trajectory x discount rate. Costs are linear in emissions, so the sum over
+# years collapses into one (paths x trajectories x rates) factor that is
+# broadcast against the emissions vector.
+#   cost:    discounted cumulative monetized emissions ($B)
+#   erosion: cost as % of the present value of flat EBITDA over the horizon
+def stress_tensor(emissions, ebitda):
+    prices = interpolate_paths(PRICE_PATHS)                  # paths x years
+    trajectories = interpolate_paths(EMISSION_TRAJECTORIES)  # trajectories x years
+    discounts = discount_factors()                            # rates x years
+    factor = np.einsum('pt,jt,rt->pjr', prices, trajectories, discounts)
+
+    cost = monetize(np.asarray(emissions, dtype=float)[:, None, None, None], factor[None])
+    ebitda_value = np.asarray(ebitda, dtype=float)[:, None] * discounts.sum(axis=1)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        erosion = cost / ebitda_value[:, None, None, :] * 100
+    return cost, erosion
+
+# Stress tensor for the whole dataset, per data version and scope variant
+# (rows align with load_enriched_data). The price paths stand in for the
+# carbon price, so valuation frameworks don't apply here. Shared by all
+# sessions rather than copied per rerun, so the arrays are read-only.
+@per_version
+@st.cache_resource(max_entries=16, show_spinner=False)
+def stress_results(version, impute=False, scopes=DEFAULT_SCOPES):
+    graph = metric_graph(version, impute)
+    cost, erosion = stress_tensor(graph.get('variant_emissions')[scopes], graph.data['ebitda_2022'])
+    cost.flags.writeable = erosion.flags.writeable = False
+    return cost, erosion
+
+def current_stress_results(impute=False, scopes=DEFAULT_SCOPES):
+    return stress_results(data_version(), impute, scopes)
+
+# Price paths as a (year x path) frame for charting
+def price_path_frame():
+    return pd.DataFrame(interpolate_paths(PRICE_PATHS).T, index=pd.Index(YEARS, name='year'),
+                        columns=list(PRICE_PATHS))
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from refresh import DataRefresher
+
+CSV = b'company_name,iso_3166_code,scope_1_emissions\nShell,GB,1.0\nNamco,NA,2.0\n'
+
+# Local stand-in for the source: serves one CSV with an ETag and
+# Last-Modified, answers matching conditional requests with 304, and records
+# every request's conditional headers and response status
+class Source:
+    def __init__(self, body):
+        self.body = body
+        self.requests = []
+
+    @property
+    def etag(self):
+        return '"' + hashlib.sha256(self.body).hexdigest()[:16] + '"'
+
+    def handler(self):
+        source = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                unchanged = self.headers.get('If-None-Match') == source.etag
+                source.requests.append((self.headers.get('If-None-Match'), 304 if unchanged else 200))
+                if unchanged:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', source.etag)
+                self.send_header('Last-Modified', 'Fri, 30 Dec 2022 00:00:00 GMT')
+                self.send_header('Content-Length', str(len(source.body)))
+                self.end_headers()
+                self.wfile.write(source.body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+@pytest.fixture
+def source():
+    source = Source(CSV)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), source.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    source.url = f'http://127.0.0.1:{server.server_address[1]}/company_data.csv'
+    yield source
+    server.shutdown()
+    server.server_close()
+
+def test_conditional_refresh_and_restore(source, tmp_path):
+    swaps = []
+    refresher = DataRefresher(source.url, interval=0, directory=str(tmp_path))
+    refresher.listeners.append(lambda version, data: swaps.append(version))
+
+    # First start: nothing stored, so the source is downloaded
+    refresher.start()
+    first = refresher.current[0]
+    assert source.requests == [(None, 200)]
+    assert refresher.current[1]['iso_3166_code'].tolist() == ['GB', 'NA']
+    assert swaps == [first]
+
+    # Unchanged source: a conditional request answered with 304
+    assert refresher.check() is False
+    assert source.requests[-1] == (source.etag, 304)
+    assert refresher.current[0] == first
+
+    # Changed source: downloaded, stored and swapped in
+    source.body = CSV + b'BP,GB,3.0\n'
+    assert refresher.check() is True
+    second = refresher.current[0]
+    assert second != first
+    assert source.requests[-1][1] == 200
+    assert len(refresher.current[1]) == 3
+    assert swaps == [first, second]
+
+    # Restart: the stored snapshot is served at once and the check is conditional
+    restarted = DataRefresher(source.url, interval=0, directory=str(tmp_path)).start()
+    assert restarted.current[0] == second
+    assert source.requests[-1] == (source.etag, 304)
+
+def test_failed_check_keeps_the_current_dataset(source, tmp_path):
+    refresher = DataRefresher(source.url, interval=0, directory=str(tmp_path)).start()
+    version = refresher.current[0]
+
+    source.body = b''  # an empty file doesn't parse
+    assert refresher.check() is False
+    assert refresher.error is not None
+    assert refresher.current[0] == version
@@ -0,0 +1,48 @@
+import hashlib
+import io
+
+import pandas as pd
+import streamlit as st
+
+from dataset import UPLOAD_VERSION_PREFIX, find_upload, pin_upload, store_upload
+from ingest import clean_chunks, tally
+
+# User-uploaded emissions CSVs (the validation/sample-rows.csv schema). An
+# upload is parsed in chunks with a progress bar, validated and normalized
+# like contributed data (see ingest.py), and held in memory under the hash
+# of its bytes, so re-uploading the same file (from any session) skips the
+# parse. Uploads are evicted least recently used first once they exceed
+# UPLOAD_MEMORY_BUDGET (see dataset.py), along with everything cached from
+# them; the run that loaded one holds on to it until the run ends.
+
+UPLOAD_CHUNK_SIZE = 20_000  # rows per chunk, one progress step each
+
+def upload_version(content):
+    return UPLOAD_VERSION_PREFIX + hashlib.sha256(content).hexdigest()[:16]
+
+# Version of an uploaded CSV and its ingestion report (rows, accepted,
+# rejected, rejections per reason). Raises ValueError if no row is valid.
+def load_upload(content):
+    version = upload_version(content)
+    upload = find_upload(version)
+    if upload is not None:
+        pin_upload(version, upload)
+        return version, upload[1]
+
+    report = {'rows': 0, 'accepted': 0, 'rejected': 0, 'reasons': {}}
+    chunks = []
+    progress = st.progress(0.0, text='Parsing upload…')
+    try:
+        for valid, rejected, bytes_read in clean_chunks(io.BytesIO(content), UPLOAD_CHUNK_SIZE):
+            chunks.append(valid)
+            tally(report, valid, rejected)
+            progress.progress(min(bytes_read / max(len(content), 1), 1.0), text=f"Parsed {report['rows']:,} rows")
+    finally:
+        progress.empty()
+
+    if not report['accepted']:
+        raise ValueError(f"No valid rows in the upload ({report['rejected']:,} rejected)")
+    upload = pd.concat(chunks, ignore_index=True), report
+    store_upload(version, *upload)
+    pin_upload(version, upload)
+    return version, report
@@ -0,0 +1,64 @@
+import numpy as np
+import streamlit as st
+
+from dataset import CARBON_PRICE, SCOPE_INCLUSION, data_version, load_enriched_data, monetize, per_version
+
+# Carbon valuation frameworks: key -> label, price in USD per tonne CO₂e for
+# scope 1, 2 and 3, and optional regional prices ({ISO 3166 codes: per-scope
+# prices}) that replace the base prices for companies headquartered there.
+EU_EEA = ('AT', 'BE', 'BG', 'CY', 'CZ', 'DE', 'DK', 'EE', 'ES', 'FI', 'FR', 'GR', 'HR', 'HU', 'IE', 'IS',
+          'IT', 'LI', 'LT', 'LU', 'LV', 'MT', 'NL', 'NO', 'PL', 'PT', 'RO', 'SE', 'SI', 'SK')
+EU_ETS_PRICE = 88   # end-2023 EUA settlement, converted to USD
+UK_ETS_PRICE = 45   # end-2023 UKA settlement, converted to USD
+
+VALUATION_FRAMEWORKS = {
+    'ifvi': {'label': 'IFVI', 'prices': [CARBON_PRICE] * 3},
+    # EPA social cost of carbon, 2020 emissions, 2020 USD
+    'epa_scc_25': {'label': 'EPA social cost of carbon (2.5%)', 'prices': [120] * 3},
+    'epa_scc_20': {'label': 'EPA social cost of carbon (2.0%)', 'prices': [190] * 3},
+    'epa_scc_15': {'label': 'EPA social cost of carbon (1.5%)', 'prices': [340] * 3},
+    'eu_ets': {'label': 'EU ETS (end-2023)', 'prices': [EU_ETS_PRICE] * 3},
+    # Compliance markets only price direct emissions where the company is based
+    'compliance': {'label': 'Compliance markets by HQ (scope 1)', 'prices': [0, 0, 0],
+                   'regions': {EU_EEA: [EU_ETS_PRICE, 0, 0], ('GB',): [UK_ETS_PRICE, 0, 0]}},
+    'shadow_100': {'label': 'Internal shadow price ($100)', 'prices': [100] * 3},
+    'shadow_operational': {'label': 'Internal shadow price (value chain at 25%)', 'prices': [100, 100, 25]},
+}
+DEFAULT_FRAMEWORK = 'ifvi'
+
+# Per-company, per-scope prices for every framework: (frameworks x companies x 3)
+def price_tensor(iso_codes):
+    iso_codes = np.asarray(iso_codes, dtype=object)
+    prices = np.array([framework['prices'] for framework in VALUATION_FRAMEWORKS.values()], dtype=float)
+    prices = np.repeat(prices[:, None, :], len(iso_codes), axis=1)
+    for f, framework in enumerate(VALUATION_FRAMEWORKS.values()):
+        for codes, regional in framework.get('regions', {}).items():
+            prices[f, np.isin(iso_codes, codes)] = regional
+    return prices
+
+# Monetized emissions ($B) for every scope variant x framework x company in
+# one pass. A value is missing only when a scope it puts a price on is.
+def framework_tensor(data):
+    scopes = data[['scope_1_emissions', 'scope_2_emissions', 'scope_3_emissions']].to_numpy(dtype=float)
+    prices = price_tensor(data['iso_3166_code'].to_numpy())
+    effective = SCOPE_INCLUSION[:, None, None, :] * prices[None]    # variants x frameworks x companies x 3
+    values = monetize(np.nan_to_num(scopes)[None, None], effective).sum(axis=-1)
+    values[(np.isnan(scopes)[None, None] & (effective > 0)).any(axis=-1)] = np.nan
+    return values
+
+# Framework x company block per data version (rows align with load_enriched_data)
+@per_version
+@st.cache_data(max_entries=8, show_spinner=False)
+def framework_values(version, impute=False):
+    return framework_tensor(load_enriched_data(impute=impute, version=version))
+
+def current_framework_values(impute=False):
+    return framework_values(data_version(), impute)
+
+# Point the headline monetized columns at one framework's values
+def apply_framework(data, monetized):
+    return data.assign(
+        monetized_all_scope_emissions=monetized,
+        ebitda_minus_monetized_emissions=data['ebitda_2022'] - monetized,
+        monetized_share_of_ebitda=monetized / data['ebitda_2022'] * 100,
+    )
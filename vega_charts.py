@@ -0,0 +1,186 @@
+from charts import FINANCIAL_COLUMNS, MAX_BARS, SCOPE_COLUMNS, downsample_rows, render_mode
+
+# Vega-Lite versions of the comparison charts. Each builder returns the narrow
+# frame the chart needs (sent to the browser as Arrow, column by column) and a
+# declarative spec; aggregation, stacking and layout happen client-side.
+
+SCOPE_LABELS = {'scope_1_emissions': 'Scope 1', 'scope_2_emissions': 'Scope 2', 'scope_3_emissions': 'Scope 3'}
+FINANCIAL_LABELS = {
+    'ebitda_2022': 'EBITDA',
+    'monetized_all_scope_emissions': 'Monetized Emissions',
+    'ebitda_minus_monetized_emissions': 'Net EBITDA',
+}
+FINANCIAL_COLORS = {'domain': list(FINANCIAL_LABELS.values()), 'range': ['blue', 'red', 'green']}
+
+# Narrow the frame to the chart's columns, renamed to their display labels
+def chart_frame(data, labels):
+    return data[['company_name', *labels]].rename(columns=labels)
+
+# Stacked scope shares per company (the browser normalizes the stack)
+def scope_breakdown_spec(data):
+    chart_data = downsample_rows(data, 'total_emissions', SCOPE_COLUMNS + ['total_emissions'])
+    chart_data = chart_frame(chart_data, SCOPE_LABELS)
+    spec = {
+        'title': 'Emissions Breakdown by Scope (%)',
+        'width': 'container',
+        'transform': [{'fold': list(SCOPE_LABELS.values()), 'as': ['Scope', 'Emissions']}],
+        'mark': 'bar',
+        'encoding': {
+            'x': {'field': 'company_name', 'type': 'nominal', 'sort': None, 'title': 'Company',
+                  'axis': {'labelAngle': -45, 'labelOverlap': True}},
+            'y': {'field': 'Emissions', 'type': 'quantitative', 'stack': 'normalize',
+                  'title': 'Percentage of Total Emissions', 'axis': {'format': '%'}},
+            'color': {'field': 'Scope', 'type': 'nominal'},
+            'tooltip': [
+                {'field': 'company_name', 'title': 'Company'},
+                {'field': 'Scope'},
+                {'field': 'Emissions', 'title': 'Emissions (MT CO₂e)', 'format': ',.1f'},
+            ],
+        },
+    }
+    return chart_data, spec
+
+# EBITDA, monetized emissions and net EBITDA per company
+def financial_impact_spec(data):
+    tooltip = [
+        {'field': 'company_name', 'title': 'Company'},
+        {'field': 'Measure'},
+        {'field': 'Value', 'title': 'Billion $', 'format': '$,.2f'},
+    ]
+    # Monetized emissions are drawn below the axis, as in the static chart
+    transform = [
+        {'fold': list(FINANCIAL_LABELS.values()), 'as': ['Measure', 'Value']},
+        {'calculate': "datum.Measure === 'Monetized Emissions' ? -datum.Value : datum.Value", 'as': 'Bar'},
+    ]
+
+    if render_mode(len(data)) == 'detailed':
+        chart_data = chart_frame(data, FINANCIAL_LABELS)
+        spec = {
+            'title': 'EBITDA minus Emissions Analysis',
+            'width': 'container',
+            'transform': transform,
+            'mark': 'bar',
+            'encoding': {
+                'x': {'field': 'company_name', 'type': 'nominal', 'sort': None, 'title': 'Company',
+                      'axis': {'labelAngle': -45}},
+                'xOffset': {'field': 'Measure', 'sort': FINANCIAL_COLORS['domain']},
+                'y': {'field': 'Bar', 'type': 'quantitative', 'title': 'Billion $'},
+                'color': {'field': 'Measure', 'type': 'nominal', 'scale': FINANCIAL_COLORS},
+                'tooltip': tooltip,
+            },
+        }
+        return chart_data, spec
+
+    # Summary: sorted small multiples, one horizontal panel per measure
+    chart_data = downsample_rows(data, 'ebitda_minus_monetized_emissions', FINANCIAL_COLUMNS, how='mean')
+    chart_data = chart_frame(chart_data.sort_values('ebitda_minus_monetized_emissions', ascending=False,
+                                                    kind='stable'), FINANCIAL_LABELS)
+    spec = {
+        'title': 'EBITDA minus Emissions Analysis (sorted by Net EBITDA)',
+        'transform': transform,
+        'facet': {'column': {'field': 'Measure', 'sort': FINANCIAL_COLORS['domain'], 'title': None}},
+        'resolve': {'scale': {'x': 'independent'}},
+        'spec': {
+            'width': 220,
+            'mark': 'bar',
+            'encoding': {
+                'y': {'field': 'company_name', 'type': 'nominal', 'sort': None, 'title': None,
+                      'axis': {'labelOverlap': True}},
+                'x': {'field': 'Bar', 'type': 'quantitative', 'title': 'Billion $'},
+                'color': {'field': 'Measure', 'type': 'nominal', 'scale': FINANCIAL_COLORS, 'legend': None},
+                'tooltip': tooltip,
+            },
+        },
+    }
+    return chart_data, spec
+
+# Total emissions by headquarters country (summed in the browser)
+def geographic_spec(data):
+    chart_data = data[['company_name', 'headquarters_country', 'total_emissions']]
+    spec = {
+        'width': 'container',
+        'mark': 'bar',
+        'encoding': {
+            'x': {'field': 'headquarters_country', 'type': 'nominal', 'title': 'Country',
+                  'axis': {'labelAngle': -45}},
+            'y': {'aggregate': 'sum', 'field': 'total_emissions', 'type': 'quantitative',
+                  'title': 'Total Emissions (MT CO₂e)'},
+            'tooltip': [
+                {'field': 'headquarters_country', 'title': 'Country'},
+                {'aggregate': 'sum', 'field': 'total_emissions', 'title': 'Total Emissions', 'format': ',.1f'},
+                {'aggregate': 'count', 'field': 'company_name', 'title': 'Companies'},
+            ],
+        },
+    }
+    return chart_data, spec
+
+# Emissions intensity against EBITDA, coloured by sector; pan/zoom and
+# click-to-highlight sectors run in the browser without a rerun. Fitted
+# sector lines (see models.fit_lines) are layered on top when given.
+def sector_scatter_spec(data, lines=None):
+    chart_data = data[['company_name', 'sector', 'ebitda_2022', 'emissions_per_billion_ebitda']]
+    points = {
+        'params': [
+            {'name': 'zoom', 'select': 'interval', 'bind': 'scales'},
+            {'name': 'highlight', 'select': {'type': 'point', 'fields': ['sector']}, 'bind': 'legend'},
+        ],
+        'mark': {'type': 'point', 'filled': True, 'size': 100 if len(data) <= MAX_BARS else 30},
+        'encoding': {
+            'x': {'field': 'ebitda_2022', 'type': 'quantitative', 'title': 'EBITDA (Billion $)'},
+            'y': {'field': 'emissions_per_billion_ebitda', 'type': 'quantitative',
+                  'title': 'Emissions Intensity (MT CO₂e/B$)'},
+            'color': {'field': 'sector', 'type': 'nominal', 'title': 'Sector'},
+            'shape': {'field': 'sector', 'type': 'nominal'},
+            'opacity': {'condition': {'param': 'highlight', 'value': 1}, 'value': 0.15},
+            'tooltip': [
+                {'field': 'company_name', 'title': 'Company'},
+                {'field': 'sector', 'title': 'Sector'},
+                {'field': 'ebitda_2022', 'title': 'EBITDA', 'format': '$,.2f'},
+                {'field': 'emissions_per_billion_ebitda', 'title': 'Intensity', 'format': ',.1f'},
+            ],
+        },
+    }
+    if lines is None:
+        return chart_data, {'width': 'container', **points}
+
+    fitted = {
+        'data': {'values': lines.to_dict('records')},
+        'mark': {'type': 'rule', 'strokeDash': [6, 4], 'strokeWidth': 1.5},
+        'encoding': {
+            'x': {'field': 'x0', 'type': 'quantitative'},
+            'x2': {'field': 'x1'},
+            'y': {'field': 'y0', 'type': 'quantitative'},
+            'y2': {'field': 'y1'},
+            'color': {'field': 'sector', 'type': 'nominal'},
+        },
+    }
+    return chart_data, {'width': 'container', 'layer': [points, fitted]}
+
+# Tornado of net EBITDA sensitivities for one company (see
+# sensitivity.tornado_rows), largest swing on top
+def tornado_spec(rows):
+    chart_data = rows[['input', 'base', 'low', 'high', 'swing']]
+    spec = {
+        'width': 'container',
+        'transform': [{'fold': ['low', 'high'], 'as': ['Change', 'Value']}],
+        'layer': [
+            {
+                'mark': 'bar',
+                'encoding': {
+                    'y': {'field': 'input', 'type': 'nominal', 'sort': list(rows['input']), 'title': 'Input'},
+                    'x': {'field': 'base', 'type': 'quantitative', 'title': 'Net EBITDA (Billion $)'},
+                    'x2': {'field': 'Value'},
+                    'color': {'field': 'Change', 'type': 'nominal', 'title': 'Input change',
+                              'scale': {'domain': ['low', 'high'], 'range': ['red', 'green']},
+                              'legend': {'labelExpr': "datum.label === 'low' ? 'Lowered' : 'Raised'"}},
+                    'tooltip': [
+                        {'field': 'input', 'title': 'Input'},
+                        {'field': 'Value', 'title': 'Net EBITDA', 'format': '$,.2f'},
+                        {'field': 'swing', 'title': 'Swing', 'format': '$,.2f'},
+                    ],
+                },
+            },
+            {'mark': {'type': 'rule', 'color': 'black'}, 'encoding': {'x': {'field': 'base', 'type': 'quantitative'}}},
+        ],
+    }
+    return chart_data, spec